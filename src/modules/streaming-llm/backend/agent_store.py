@@ -1,9 +1,15 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
-import yaml
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import os
+import re
+
+import orjson
+
+from .fileio import replace_atomically
 
 
 DEFAULT_AGENT_DEFINITIONS = (
@@ -33,6 +39,17 @@ DEFAULT_AGENT_DEFINITIONS = (
     },
 )
 
+FRONTMATTER_KEYS = ("id", "name", "system_prompt")
+# Parsed agents plus the stat of the file they came from, reused across restarts.
+SNAPSHOT_NAME = ".agents.cache.json"
+SNAPSHOT_VERSION = 1
+# Values matching this pattern round-trip through YAML as plain strings, so the
+# frontmatter can be written and read as bare "key: value" lines.
+_PLAIN_SCALAR = re.compile(r"[A-Za-z_][\w .,;()/+-]*")
+_YAML_RESERVED = frozenset({"y", "n", "yes", "no", "on", "off", "true", "false", "null"})
+# Characters json.dumps leaves raw that YAML rejects or reads as line breaks.
+_YAML_UNPRINTABLE = re.compile("[\x7f-\x9f\u2028\u2029\ufffe\uffff]")
+
 
 @dataclass
 class Agent:
@@ -42,8 +59,12 @@ class Agent:
     markdown_context: str
 
     def to_dict(self) -> Dict[str, str]:
-        data = asdict(self)
-        return data
+        return {
+            "id": self.id,
+            "name": self.name,
+            "system_prompt": self.system_prompt,
+            "markdown_context": self.markdown_context,
+        }
 
 
 class AgentStore:
@@ -51,15 +72,38 @@ class AgentStore:
         self.root = Path(root)
         self.root.mkdir(parents=True, exist_ok=True)
         self._agents: Dict[str, Agent] = {}
+        # path -> (st_mtime_ns, st_size, parsed agent) for every scanned file
+        self._stat_cache: Dict[Path, Tuple[int, int, Optional[Agent]]] = self._load_snapshot()
+        self._snapshot_dirty = False
         self._seed_default_agents()
         self.reload()
 
     def reload(self) -> None:
+        """Rescan the agents directory, re-parsing only files whose stat changed."""
+        stat_cache: Dict[Path, Tuple[int, int, Optional[Agent]]] = {}
+        agents: Dict[str, Agent] = {}
+        parsed = False
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".md") or not entry.is_file():
+                    continue
+                path = Path(entry.path)
+                stat = entry.stat()
+                cached = self._stat_cache.get(path)
+                if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                    agent = cached[2]
+                else:
+                    agent = self._read_agent_file(path)
+                    parsed = True
+                stat_cache[path] = (stat.st_mtime_ns, stat.st_size, agent)
+                if agent:
+                    agents[agent.id] = agent
+        changed = self._snapshot_dirty or parsed or stat_cache.keys() != self._stat_cache.keys()
+        self._stat_cache = stat_cache
         self._agents.clear()
-        for path in self.root.glob("*.md"):
-            agent = self._read_agent_file(path)
-            if agent:
-                self._agents[agent.id] = agent
+        self._agents.update(agents)
+        if changed:
+            self._write_snapshot()
 
     def list_agents(self) -> List[Agent]:
         return list(self._agents.values())
@@ -81,18 +125,18 @@ class AgentStore:
             markdown_context=markdown_context,
         )
         path = self.root / f"{agent_id}.md"
-        frontmatter = yaml.safe_dump(
+        frontmatter = _dump_frontmatter(
             {
                 "id": agent.id,
                 "name": agent.name,
                 "system_prompt": agent.system_prompt,
-            },
-            sort_keys=False,
-            allow_unicode=False,
-        ).strip()
+            }
+        )
         markdown_block = agent.markdown_context.rstrip() + "\n"
         content = f"---\n{frontmatter}\n---\n\n{markdown_block}"
-        path.write_text(content)
+        # Write-then-rename so reload() never observes a partially written file.
+        replace_atomically(path, content.encode("utf-8"))
+        self._remember(path, self._parse_agent_text(content, path))
         self._agents[agent.id] = agent
         return agent
 
@@ -102,11 +146,45 @@ class AgentStore:
             self._agents.pop(agent_id, None)
             removed = True
         path = self.root / f"{agent_id}.md"
+        if self._stat_cache.pop(path, None):
+            self._snapshot_dirty = True
         if path.exists():
             path.unlink()
             removed = True
         return removed
 
+    def _remember(self, path: Path, agent: Optional[Agent]) -> None:
+        stat = path.stat()
+        self._stat_cache[path] = (stat.st_mtime_ns, stat.st_size, agent)
+        self._snapshot_dirty = True
+
+    def _load_snapshot(self) -> Dict[Path, Tuple[int, int, Optional[Agent]]]:
+        try:
+            raw = orjson.loads((self.root / SNAPSHOT_NAME).read_bytes())
+            if raw.get("version") != SNAPSHOT_VERSION:
+                return {}
+            return {
+                self.root / name: (mtime_ns, size, Agent(**data) if data else None)
+                for name, (mtime_ns, size, data) in raw["files"].items()
+            }
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return {}
+
+    def _write_snapshot(self) -> None:
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "files": {
+                path.name: [mtime_ns, size, agent.to_dict() if agent else None]
+                for path, (mtime_ns, size, agent) in self._stat_cache.items()
+            },
+        }
+        path = self.root / SNAPSHOT_NAME
+        try:
+            replace_atomically(path, orjson.dumps(snapshot))
+            self._snapshot_dirty = False
+        except OSError:
+            pass  # the snapshot is only a warm-start cache
+
     def _seed_default_agents(self) -> None:
         for definition in DEFAULT_AGENT_DEFINITIONS:
             path = self.root / f"{definition['id']}.md"
@@ -120,7 +198,9 @@ class AgentStore:
             )
 
     def _read_agent_file(self, path: Path) -> Optional[Agent]:
-        raw_text = path.read_text()
+        return self._parse_agent_text(path.read_text(encoding="utf-8"), path)
+
+    def _parse_agent_text(self, raw_text: str, path: Path) -> Optional[Agent]:
         if not raw_text.strip():
             return None
         text = raw_text
@@ -130,8 +210,7 @@ class AgentStore:
             parts = text.split("---", 2)
             if len(parts) == 3:
                 _, fm_text, body = parts
-                loaded = yaml.safe_load(fm_text) or {}
-                meta = {k: str(v) for k, v in loaded.items()}
+                meta = _load_frontmatter(fm_text)
                 body = body.lstrip("\n")
         agent_id = meta.get("id") or path.stem
         name = meta.get("name") or agent_id
@@ -143,3 +222,44 @@ class AgentStore:
             system_prompt=system_prompt,
             markdown_context=markdown_context,
         )
+
+
+def _is_plain_scalar(value: str) -> bool:
+    return (
+        _PLAIN_SCALAR.fullmatch(value) is not None
+        and value == value.rstrip()
+        and value.lower() not in _YAML_RESERVED
+    )
+
+
+def _escape_yaml_scalar(value: str) -> str:
+    if _is_plain_scalar(value):
+        return value
+    # A JSON string literal is also a valid YAML double-quoted scalar.
+    quoted = json.dumps(value, ensure_ascii=False)
+    return _YAML_UNPRINTABLE.sub(lambda match: f"\\u{ord(match.group()):04x}", quoted)
+
+
+def _dump_frontmatter(meta: Dict[str, str]) -> str:
+    return "\n".join(f"{key}: {_escape_yaml_scalar(value)}" for key, value in meta.items())
+
+
+def _load_frontmatter(fm_text: str) -> Dict[str, str]:
+    meta: Dict[str, str] = {}
+    for line in fm_text.strip().splitlines():
+        key, sep, value = line.partition(": ")
+        if not sep or key not in FRONTMATTER_KEYS or not _is_plain_scalar(value):
+            break
+        meta[key] = value
+    else:
+        return meta
+    loaded = _yaml_safe_load(fm_text) or {}
+    return {k: str(v) for k, v in loaded.items()}
+
+
+def _yaml_safe_load(text: str) -> Any:
+    # PyYAML is only needed for frontmatter that is not in the plain-line form.
+    import yaml
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(text, Loader=loader)
@@ -1,8 +1,6 @@
 from __future__ import annotations
 
-import os
 import time
-from pathlib import Path
 from typing import Any, Dict, Optional
 
 from backend.log import query as log_query
@@ -10,8 +8,7 @@ from backend.task_graph import store as task_store
 
 from .base import AgentResult, AgentTask, AgentError
 
-DATA_ROOT = Path(os.environ.get("STREAMING_LLM_DATA_DIR") or Path(__file__).resolve().parents[2] / "data")
-LOG_ROOT = DATA_ROOT / "logs"
+_PENDING = frozenset(("PENDING",))
 
 
 class PolicyViolation(ValueError):
@@ -26,19 +23,24 @@ class AgentRuntime:
         self.agent_type = agent_type
         self.heartbeat_interval = heartbeat_interval
         self.last_heartbeat_at: Optional[float] = None
+        self._last_update_at: Dict[str, float] = {}
+        self._last_update_msg: Dict[str, str] = {}
 
     def poll_next_task(self) -> Optional[AgentTask]:
-        tasks = task_store.list_active({"PENDING"})
-        for node in tasks:
+        while True:
+            task_id = task_store.next_ready(self.agent_type)
+            if task_id is None:
+                break
+            claimed = task_store.claim_task(task_id, self.agent_id)
+            if claimed:
+                return self._to_agent_task(claimed)
+        # Tasks created by other processes never reach the in-process queue.
+        for node in task_store.list_active(_PENDING):
             if node.get("type") != self.agent_type:
                 continue
-            claimed = task_store.update_task(
-                node["id"],
-                status="IN_PROGRESS",
-                owner=self.agent_id,
-                attempt=node.get("attempt", 0) + 1,
-            )
-            return self._to_agent_task(claimed)
+            claimed = task_store.claim_task(node["id"], self.agent_id)
+            if claimed:
+                return self._to_agent_task(claimed)
         return None
 
     def emit_update(
@@ -48,6 +50,11 @@ class AgentRuntime:
         progress: Optional[Dict[str, Any]] = None,
         extra: Optional[Dict[str, Any]] = None,
     ) -> None:
+        now = time.time()
+        if progress is None and not extra and self._last_update_msg.get(task.id) == message:
+            # Repeats of the previous message inside one heartbeat interval carry no news.
+            if now - self._last_update_at[task.id] < self.heartbeat_interval:
+                return
         payload: Dict[str, Any] = {
             "task_id": task.id,
             "agent_id": self.agent_id,
@@ -60,7 +67,9 @@ class AgentRuntime:
             payload.update(extra)
         self._enforce_policy(payload)
         self._append_event(task, "AGENT_UPDATE", payload)
-        self.last_heartbeat_at = time.time()
+        self._last_update_at[task.id] = now
+        self._last_update_msg[task.id] = message
+        self.last_heartbeat_at = now
 
     def complete_task(self, task: AgentTask, result: AgentResult) -> Dict[str, Any]:
         payload = {
@@ -73,7 +82,8 @@ class AgentRuntime:
             "next_actions": result.next_actions,
         }
         self._enforce_policy(payload)
-        self._append_event(task, "AGENT_RESULT", payload)
+        self._append_event(task, "AGENT_RESULT", payload, sync=True)
+        self._forget_updates(task.id)
         return task_store.update_task(task.id, status="COMPLETED", outputs={"result": payload})
 
     def fail_task(self, task: AgentTask, error: AgentError) -> Dict[str, Any]:
@@ -85,7 +95,8 @@ class AgentRuntime:
             "error": error.to_payload(),
         }
         self._enforce_policy(payload)
-        self._append_event(task, "AGENT_RESULT", payload)
+        self._append_event(task, "AGENT_RESULT", payload, sync=True)
+        self._forget_updates(task.id)
         return task_store.update_task(
             task.id,
             status="FAILED",
@@ -98,17 +109,23 @@ class AgentRuntime:
         current = now or time.time()
         return (current - last_ts) >= self.heartbeat_interval
 
-    def _append_event(self, task: AgentTask, kind: str, payload: Dict[str, Any]) -> None:
-        LOG_ROOT.mkdir(parents=True, exist_ok=True)
+    def _append_event(self, task: AgentTask, kind: str, payload: Dict[str, Any], sync: bool = False) -> None:
+        # Results are committed before the task transitions so the log never lags the graph.
         log_query.append_event(
             {
                 "conversation_id": task.conversation_id(),
                 "type": kind,
                 "payload": payload,
                 "visibility": "internal",
-            }
+            },
+            sync=sync,
         )
 
+    def _forget_updates(self, task_id: str) -> None:
+        # A finished task emits no more updates; drop its dedup state.
+        self._last_update_at.pop(task_id, None)
+        self._last_update_msg.pop(task_id, None)
+
     def _enforce_policy(self, payload: Dict[str, Any]) -> None:
         if payload.get("render_to_user"):
             raise PolicyViolation("Agent events cannot add user-visible output; narrator only.")
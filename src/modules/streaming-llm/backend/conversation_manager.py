@@ -1,28 +1,62 @@
-from collections import deque
-from typing import Deque, Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import uuid4
 
 
+def format_turn(role: str, content: str) -> str:
+    """Render a turn the way it appears in the prompt's history section."""
+    return f"{role.upper()}: {content.strip()}"
+
+
+class _TurnRing:
+    """Fixed-capacity turn buffer; overwrites the oldest turn once full."""
+
+    __slots__ = ("capacity", "turns", "count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.turns: List[Dict[str, str]] = []
+        self.count = 0
+
+    def append(self, turn: Dict[str, str]) -> None:
+        if self.capacity <= 0:
+            return
+        if len(self.turns) < self.capacity:
+            self.turns.append(turn)
+        else:
+            self.turns[self.count % self.capacity] = turn
+        self.count += 1
+
+    def snapshot(self) -> Tuple[Dict[str, str], ...]:
+        if self.count <= self.capacity:
+            return tuple(self.turns)
+        start = self.count % self.capacity
+        return tuple(self.turns[start:] + self.turns[:start])
+
+
 class ConversationManager:
     def __init__(self, max_turns: int = 10):
-        self._conversations: Dict[str, Deque[Dict[str, str]]] = {}
+        self._conversations: Dict[str, _TurnRing] = {}
         self.max_turns = max_turns
 
     def ensure(self, conversation_id: Optional[str]) -> str:
         if conversation_id and conversation_id in self._conversations:
             return conversation_id
         new_id = conversation_id or str(uuid4())
-        self._conversations[new_id] = deque(maxlen=self.max_turns)
+        self._conversations[new_id] = _TurnRing(self.max_turns)
         return new_id
 
     def append(self, conversation_id: str, role: str, content: str) -> None:
-        convo = self._conversations.setdefault(
-            conversation_id, deque(maxlen=self.max_turns)
-        )
-        convo.append({"role": role, "content": content})
+        convo = self._conversations.get(conversation_id)
+        if convo is None:
+            convo = self._conversations[conversation_id] = _TurnRing(self.max_turns)
+        convo.append({"role": role, "content": content, "line": format_turn(role, content)})
 
-    def history(self, conversation_id: str) -> List[Dict[str, str]]:
+    def snapshot(self, conversation_id: str) -> Tuple[Dict[str, str], ...]:
+        """Read-only view of the retained turns, oldest first."""
         convo = self._conversations.get(conversation_id)
-        if not convo:
-            return []
-        return list(convo)
+        if convo is None:
+            return ()
+        return convo.snapshot()
+
+    def history(self, conversation_id: str) -> List[Dict[str, str]]:
+        return list(self.snapshot(conversation_id))
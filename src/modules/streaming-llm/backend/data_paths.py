@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import functools
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional, Union
+
+MODULE_ROOT = Path(__file__).resolve().parents[1]
+
+
+class DataPaths(NamedTuple):
+    root: Path
+    logs: Path
+    summaries: Path
+    graph: Path
+
+    @classmethod
+    def under(cls, root: Union[str, Path]) -> "DataPaths":
+        root = Path(root)
+        return cls(
+            root=root,
+            logs=root / "logs",
+            summaries=root / "summaries",
+            graph=root / "tasks.graph.json",
+        )
+
+
+_override: ContextVar[Optional[DataPaths]] = ContextVar("streaming_llm_data_dir", default=None)
+
+
+def data_paths() -> DataPaths:
+    """Resolve the sidecar data layout.
+
+    A directory entered with :func:`use_data_dir` wins; otherwise the layout
+    comes from ``STREAMING_LLM_DATA_DIR``.
+    """
+    return _override.get() or _environment_paths()
+
+
+@functools.lru_cache(maxsize=1)
+def _environment_paths() -> DataPaths:
+    # Cached; call ``_environment_paths.cache_clear()`` after changing the variable.
+    return DataPaths.under(os.environ.get("STREAMING_LLM_DATA_DIR") or MODULE_ROOT / "data")
+
+
+@contextmanager
+def use_data_dir(path: Union[str, Path]) -> Iterator[DataPaths]:
+    """Point data_paths() at ``path`` for the current context.
+
+    Threads and executor jobs started inside the block do not inherit it
+    unless they copy the context.
+    """
+    token = _override.set(DataPaths.under(path))
+    try:
+        yield _override.get()
+    finally:
+        _override.reset(token)
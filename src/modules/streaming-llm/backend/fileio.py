@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import os
+import stat
+import tempfile
+from pathlib import Path
+
+# os.umask() can only be read by setting it, so it is sampled once at import
+# rather than toggled (and briefly cleared for other threads) on every write.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def replace_atomically(path: Path, data: bytes) -> None:
+    """Write ``data`` to ``path`` through a uniquely named sibling and rename it.
+
+    Readers never observe a partially written file, and concurrent writers of
+    the same path each use their own temporary file; the last rename wins.
+    An existing file keeps its permissions; a new one gets the mode open()
+    would have given it.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            os.fchmod(handle.fileno(), mode)
+            handle.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
@@ -1,91 +1,418 @@
 from __future__ import annotations
 
-import json
+import atexit
+import bisect
+import functools
+import heapq
+import logging
 import os
+import queue
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
+from operator import itemgetter
 from pathlib import Path
-from typing import Iterable, List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import uuid
-import fcntl
 
-DATA_ROOT = Path(os.environ.get("STREAMING_LLM_DATA_DIR") or Path(__file__).resolve().parents[2] / "data")
-LOG_ROOT = DATA_ROOT / "logs"
+import orjson
 
+from backend.data_paths import data_paths
 
-def append_event(event: Dict[str, Any]) -> str:
+
+def _dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Group commit: the writer drains up to BATCH_MAX_EVENTS queued lines, waiting at
+# most BATCH_WINDOW_SECONDS for stragglers, and fsyncs each touched file once.
+BATCH_MAX_EVENTS = 256
+BATCH_WINDOW_SECONDS = 0.002
+# Most conversation logs kept open for appending by the writer thread; the
+# least recently written are closed first.
+LOG_FD_CACHE_SIZE = 64
+# Most writes queued for the writer thread; producers block beyond this.
+WRITER_QUEUE_SIZE = 4096
+# Width of the timestamps written by ``_now_iso``; others are canonicalized.
+TIMESTAMP_WIDTH = len("2024-01-01T00:00:00.000000Z")
+
+logger = logging.getLogger(__name__)
+
+
+class _Completion:
+    """Signalled once a queued write is durable or has failed."""
+
+    __slots__ = ("event", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> None:
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+
+
+_PendingWrite = Tuple[Path, bytes, Optional[_Completion]]
+
+
+class _LogMirror:
+    """Parsed copy of one JSONL log, extended as the file grows.
+
+    ``stamps`` holds each event's canonical timestamp and ``by_type`` the
+    positions of each event type, both parallel to ``events``.
+    """
+
+    __slots__ = ("inode", "offset", "events", "stamps", "by_type")
+
+    def __init__(self, inode: int) -> None:
+        self.inode = inode
+        self.offset = 0
+        self.events: List[Dict[str, Any]] = []
+        self.stamps: List[str] = []
+        self.by_type: Dict[Any, List[int]] = {}
+
+    def extend(self, lines: bytes) -> None:
+        # Parse and key everything before touching the parallel lists, so a
+        # bad line from another writer cannot leave them out of step.
+        parsed = []
+        stamp = self.stamps[-1] if self.stamps else ""
+        for line in lines.split(b"\n"):
+            entry = _parse_entry(line)
+            if entry is None:
+                continue
+            # Stamps that cannot be compared inherit the previous one, which
+            # keeps the list sorted for since()'s bisect.
+            stamp = _comparable_timestamp(entry.get("timestamp")) or stamp
+            kind = entry.get("type")
+            parsed.append((entry, stamp, kind if kind.__hash__ is not None else None))
+        for entry, stamp, kind in parsed:
+            self.by_type.setdefault(kind, []).append(len(self.events))
+            self.events.append(entry)
+            self.stamps.append(stamp)
+        self.offset += len(lines)
+
+
+class _WriterThread(threading.Thread):
+    def __init__(self) -> None:
+        super().__init__(name="log-query-writer", daemon=True)
+        self._queue: "queue.Queue[_PendingWrite]" = queue.Queue(maxsize=WRITER_QUEUE_SIZE)
+        # Serializes put() with the submitted count so that the first N queued
+        # writes are exactly the first N counted ones.
+        self._submit_lock = threading.Lock()
+        self._submitted = 0
+        self._committed = 0
+        self._committed_cond = threading.Condition()
+
+    def submit(self, path: Path, data: bytes, done: Optional[_Completion] = None) -> None:
+        with self._submit_lock:
+            self._queue.put((path, data, done))
+            self._submitted += 1
+
+    def wait_committed(self) -> None:
+        """Block until every write submitted before this call has been handled.
+
+        Writes submitted meanwhile are not waited for, so readers cannot be
+        starved by a steady stream of appends.
+        """
+        target = self._submitted
+        with self._committed_cond:
+            self._committed_cond.wait_for(lambda: self._committed >= target)
+
+    def run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_WINDOW_SECONDS
+            while len(batch) < BATCH_MAX_EVENTS:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                _commit_batch(batch)
+            except Exception as exc:
+                # Fail this batch's waiters but keep the writer alive.
+                logger.exception("Failed to commit %d queued event(s)", len(batch))
+                for *_, done in batch:
+                    if done is not None and done.error is None:
+                        done.error = exc
+            finally:
+                for *_, done in batch:
+                    if done is not None:
+                        done.event.set()
+                with self._committed_cond:
+                    self._committed += len(batch)
+                    self._committed_cond.notify_all()
+
+
+_writer: Optional[_WriterThread] = None
+_writer_lock = threading.Lock()
+# Log files are the source of truth (the TypeScript server appends to them
+# too); mirrors only save re-reading and re-parsing lines already seen.
+_mirrors: Dict[Path, _LogMirror] = {}
+# Only the writer thread touches the descriptor cache.
+_log_fds: "OrderedDict[Path, int]" = OrderedDict()
+_mirrors_lock = threading.RLock()
+
+
+def append_event(event: Dict[str, Any], sync: bool = False) -> str:
+    """Queue an event for the group-commit writer and return its id.
+
+    With ``sync=True`` the call blocks until the batch holding the event has
+    been fsynced, and raises if the write failed.
+    """
+    path, entry = _prepare_entry(event)
+    done = _Completion() if sync else None
+    _get_writer().submit(path, _dumps(entry) + b"\n", done)
+    if done is not None:
+        done.wait()
+    return entry["id"]
+
+
+def append_events(events: List[Dict[str, Any]], sync: bool = False) -> List[str]:
+    """Queue several events at once and return their ids in order.
+
+    Events for the same conversation reach its log in a single write. Nothing
+    is queued if any event is invalid. With ``sync=True`` the call blocks until
+    every write is durable and raises the first failure.
+    """
+    grouped: Dict[Path, List[bytes]] = {}
+    ids = []
+    for event in events:
+        path, entry = _prepare_entry(event)
+        grouped.setdefault(path, []).append(_dumps(entry) + b"\n")
+        ids.append(entry["id"])
+    writer = _get_writer()
+    pending = []
+    for path, lines in grouped.items():
+        done = _Completion() if sync else None
+        writer.submit(path, b"".join(lines), done)
+        pending.append(done)
+    if sync:
+        for done in pending:
+            done.wait()
+    return ids
+
+
+def flush_pending() -> None:
+    """Block until every event queued before this call has been written and fsynced."""
+    if _writer is not None:
+        _writer.wait_committed()
+
+
+def tail(conversation_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    if limit <= 0:
+        return []
+    flush_pending()
+    with _mirrors_lock:
+        mirror = _mirror(data_paths().logs / f"{conversation_id}.jsonl")
+        if mirror is None:
+            return []
+        entries = mirror.events[-limit:]
+    return _copy_entries(entries)
+
+
+def since(timestamp: str) -> List[Dict[str, Any]]:
+    # Logs are append-only, so each file's events are already in timestamp
+    # order: bisect for the cutoff and merge the per-file suffixes.
+    flush_pending()
+    cutoff = _canonical_timestamp(timestamp)
+    streams = []
+    with _mirrors_lock:
+        for log_file in _log_files():
+            mirror = _mirror(log_file)
+            if mirror is None:
+                continue
+            start = bisect.bisect_left(mirror.stamps, cutoff)
+            streams.append([
+                (mirror.stamps[position], mirror.events[position])
+                for position in range(start, len(mirror.events))
+            ])
+    return _copy_entries([entry for _, entry in heapq.merge(*streams, key=itemgetter(0))])
+
+
+def by_type(event_types: List[str], visibility: Optional[str] = None) -> List[Dict[str, Any]]:
+    flush_pending()
+    types = set(event_types)
+    streams = []
+    with _mirrors_lock:
+        for log_file in _log_files():
+            mirror = _mirror(log_file)
+            if mirror is None:
+                continue
+            positions = heapq.merge(*(mirror.by_type.get(event_type, ()) for event_type in types))
+            streams.append([
+                (mirror.stamps[position], mirror.events[position])
+                for position in positions
+                if not visibility or mirror.events[position].get("visibility") == visibility
+            ])
+    return _copy_entries([entry for _, entry in heapq.merge(*streams, key=itemgetter(0))])
+
+
+def _copy_entries(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Mirrored entries are shared across queries; callers get their own
+    # nested payloads, copied in one JSON round trip.
+    return orjson.loads(_dumps(entries))
+
+
+def _prepare_entry(event: Dict[str, Any]) -> Tuple[Path, Dict[str, Any]]:
     conversation_id = event.get("conversation_id")
     if not conversation_id:
         raise ValueError("conversation_id is required")
-    LOG_ROOT.mkdir(parents=True, exist_ok=True)
     entry = dict(event)
-    entry.setdefault("conversation_id", conversation_id)
     entry.setdefault("id", f"evt-{uuid.uuid4().hex}")
     entry["timestamp"] = _now_iso()
-    path = LOG_ROOT / f"{conversation_id}.jsonl"
-    with path.open("a+", encoding="utf-8") as handle:
-        _lock(handle, fcntl.LOCK_EX)
-        handle.seek(0, os.SEEK_END)
-        handle.write(json.dumps(entry, ensure_ascii=False))
-        handle.write("\n")
-        handle.flush()
-        os.fsync(handle.fileno())
-        _lock(handle, fcntl.LOCK_UN)
-    return entry["id"]
+    return data_paths().logs / f"{conversation_id}.jsonl", entry
 
 
-def tail(conversation_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-    path = LOG_ROOT / f"{conversation_id}.jsonl"
-    if not path.exists():
+def _log_files() -> List[Path]:
+    logs = data_paths().logs
+    if not logs.exists():
         return []
-    with path.open("r", encoding="utf-8") as handle:
-        _lock(handle, fcntl.LOCK_SH)
-        lines = handle.readlines()
-        _lock(handle, fcntl.LOCK_UN)
-    return [_parse_line(line) for line in lines[-limit:]]
+    return sorted(logs.glob("*.jsonl"))
 
 
-def since(timestamp: str) -> List[Dict[str, Any]]:
-    cutoff = _parse_timestamp(timestamp)
-    events = []
-    for entry in _iter_all_events():
-        event_time = _parse_timestamp(entry["timestamp"])
-        if event_time >= cutoff:
-            events.append(entry)
-    events.sort(key=lambda item: item["timestamp"])
-    return events
+def _mirror(path: Path) -> Optional[_LogMirror]:
+    """Bring the mirror of ``path`` up to date with the file and return it.
 
+    Only bytes appended since the last call are parsed; a replaced or
+    truncated file is re-read from the start.
+    """
+    try:
+        handle = path.open("rb")
+    except FileNotFoundError:
+        with _mirrors_lock:
+            _mirrors.pop(path, None)
+        return None
+    with handle:
+        stat = os.fstat(handle.fileno())
+        with _mirrors_lock:
+            mirror = _mirrors.get(path)
+            if mirror is None or mirror.inode != stat.st_ino or stat.st_size < mirror.offset:
+                mirror = _mirrors[path] = _LogMirror(stat.st_ino)
+            if stat.st_size > mirror.offset:
+                fresh = os.pread(handle.fileno(), stat.st_size - mirror.offset, mirror.offset)
+                # Leave a partially written last line for the next call.
+                mirror.extend(fresh[: fresh.rfind(b"\n") + 1])
+            return mirror
 
-def by_type(event_types: List[str], visibility: Optional[str] = None) -> List[Dict[str, Any]]:
-    types = set(event_types)
-    results = []
-    for entry in _iter_all_events():
-        if entry.get("type") not in types:
-            continue
-        if visibility and entry.get("visibility") != visibility:
+
+def _get_writer() -> _WriterThread:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = _WriterThread()
+                writer.start()
+                _writer = writer
+    return _writer
+
+
+def _commit_batch(batch: List[_PendingWrite]) -> None:
+    grouped: Dict[Path, List[_PendingWrite]] = {}
+    for pending in batch:
+        grouped.setdefault(pending[0], []).append(pending)
+    for path, writes in grouped.items():
+        payload = b"".join(data for _, data, _ in writes)
+        try:
+            fd, before = _append_fd(path)
+            # O_APPEND places each write atomically at the current end of
+            # file, so concurrent appenders cannot interleave inside it.
+            written = os.write(fd, payload)
+            while written < len(payload):
+                written += os.write(fd, payload[written:])
+            os.fsync(fd)
+            after = os.fstat(fd).st_size
+        except OSError as exc:
+            logger.exception("Failed to append %d write(s) to %s", len(writes), path)
+            for *_, done in writes:
+                if done is not None:
+                    done.error = exc
+            _close_fd(path)
             continue
-        results.append(entry)
-    results.sort(key=lambda item: item["timestamp"])
-    return results
+        with _mirrors_lock:
+            # Extend a mirror that was current up to our write, unless another
+            # process appended around it; readers then catch up from disk.
+            mirror = _mirrors.get(path)
+            if (
+                mirror is not None
+                and mirror.inode == before.st_ino
+                and mirror.offset == before.st_size
+                and after == before.st_size + len(payload)
+            ):
+                mirror.extend(payload)
 
 
-def _iter_all_events() -> Iterable[Dict[str, Any]]:
-    if not LOG_ROOT.exists():
-        return []
-    for log_file in sorted(LOG_ROOT.glob("*.jsonl")):
-        with log_file.open("r", encoding="utf-8") as handle:
-            _lock(handle, fcntl.LOCK_SH)
-            for line in handle:
-                yield _parse_line(line)
-            _lock(handle, fcntl.LOCK_UN)
+def _append_fd(path: Path) -> Tuple[int, os.stat_result]:
+    """Return a cached O_APPEND descriptor for ``path`` and its current stat.
+
+    A descriptor whose file has since been unlinked is reopened.
+    """
+    fd = _log_fds.get(path)
+    if fd is not None:
+        stat = os.fstat(fd)
+        if stat.st_nlink:
+            _log_fds.move_to_end(path)
+            return fd, stat
+        _close_fd(path)
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC
+    try:
+        fd = os.open(path, flags, 0o644)
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, flags, 0o644)
+    _log_fds[path] = fd
+    while len(_log_fds) > LOG_FD_CACHE_SIZE:
+        _, stale = _log_fds.popitem(last=False)
+        os.close(stale)
+    return fd, os.fstat(fd)
+
+
+def _close_fd(path: Path) -> None:
+    fd = _log_fds.pop(path, None)
+    if fd is not None:
+        os.close(fd)
 
 
-def _parse_line(line: str) -> Dict[str, Any]:
+def _parse_entry(line: bytes) -> Optional[Dict[str, Any]]:
+    """Decode one log line, or return None if it is blank or not a JSON object."""
     line = line.strip()
     if not line:
-        return {}
-    return json.loads(line)
+        return None
+    try:
+        entry = orjson.loads(line)
+    except ValueError:
+        logger.warning("Skipping undecodable log line: %.80r", line)
+        return None
+    return entry if type(entry) is dict else None
+
+
+def _comparable_timestamp(value: Any) -> str:
+    """Return the canonical form of ``value``, or "" if it is not an ISO timestamp."""
+    if type(value) is not str:
+        return ""
+    if len(value) == TIMESTAMP_WIDTH or not value:
+        return value
+    # Written by another producer (e.g. millisecond toISOString()).
+    try:
+        return _canonical_timestamp(value)
+    except ValueError:
+        return ""
+
+
+def _canonical_timestamp(value: str) -> str:
+    """Normalize to the fixed-width UTC form written by ``_now_iso`` so that
+    timestamps can be compared as plain strings."""
+    parsed = _parse_timestamp(value).astimezone(timezone.utc)
+    return parsed.isoformat(timespec="microseconds").replace("+00:00", "Z")
 
 
+@functools.lru_cache(maxsize=4096)
 def _parse_timestamp(value: str) -> datetime:
     if value.endswith("Z"):
         value = value.replace("Z", "+00:00")
@@ -93,8 +420,10 @@ def _parse_timestamp(value: str) -> datetime:
 
 
 def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    # Always emits six fractional digits, keeping timestamps fixed-width and
+    # therefore comparable as strings.
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{nanos // 1000:06d}Z"
 
 
-def _lock(handle, mode):
-    fcntl.flock(handle.fileno(), mode)
+atexit.register(flush_pending)
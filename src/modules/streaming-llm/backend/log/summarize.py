@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+import functools
 import hashlib
 import json
-import os
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 
-DATA_ROOT = Path(os.environ.get("STREAMING_LLM_DATA_DIR") or Path(__file__).resolve().parents[2] / "data")
-SUMMARIES_ROOT = DATA_ROOT / "summaries"
+from backend.data_paths import data_paths
+from backend.fileio import replace_atomically
+
+# Payload value types eligible for the memoized serializer below.
+_SCALAR_TYPES = frozenset({str, int, float, bool, type(None)})
 
 
 def rolling_summary(conversation_id: str, events: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -16,13 +19,32 @@ def rolling_summary(conversation_id: str, events: List[Dict[str, Any]]) -> Dict[
     for event in events:
         group = event.get("type", "UNKNOWN")
         groups[group].append(_stringify_event(event))
+    return _render_summary(conversation_id, groups)
+
+
+def rolling_summary_columnar(
+    conversation_id: str, types: Sequence[str], payloads: Sequence[Any]
+) -> Dict[str, Any]:
+    """Summarize events given as parallel ``types`` and ``payloads`` columns.
+
+    Produces the same summary as :func:`rolling_summary` for events that carry
+    only a type and a payload, without building a dict per event.
+    """
+    if len(types) != len(payloads):
+        raise ValueError("types and payloads must have the same length")
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for event_type, payload in zip(types, payloads):
+        text = _stringify_payload(payload)
+        groups[event_type].append("(no payload)" if text is None else text)
+    return _render_summary(conversation_id, groups)
+
 
-    lines: List[str] = []
-    for group in sorted(groups.keys()):
-        lines.append(f"### {group}")
-        for item in groups[group]:
-            lines.append(f"- {item}")
-    content = "\n".join(lines).strip()
+def _render_summary(conversation_id: str, groups: Dict[str, List[str]]) -> Dict[str, Any]:
+    # Every item renders as "- <text>", so the bullet prefix is folded into the
+    # join separator instead of formatting each item.
+    sections = [f"### {group}\n- " + "\n- ".join(groups[group]) for group in sorted(groups)]
+    content = "\n".join(sections).strip()
+    # One digest over the final encoded text instead of incremental updates.
     summary_ref = hashlib.sha256(content.encode("utf-8")).hexdigest()
     return {
         "conversation_id": conversation_id,
@@ -32,19 +54,41 @@ def rolling_summary(conversation_id: str, events: List[Dict[str, Any]]) -> Dict[
 
 
 def persist_summary(conversation_id: str, summary: Dict[str, Any]) -> Path:
-    SUMMARIES_ROOT.mkdir(parents=True, exist_ok=True)
-    path = SUMMARIES_ROOT / f"{conversation_id}.md"
+    summaries = data_paths().summaries
+    summaries.mkdir(parents=True, exist_ok=True)
+    path = summaries / f"{conversation_id}.md"
     header = f"<!-- summary_ref:{summary['summary_ref']} -->\n"
-    path.write_text(header + summary["content"] + "\n", encoding="utf-8")
+    replace_atomically(path, (header + summary["content"] + "\n").encode("utf-8"))
     return path
 
 
 def _stringify_event(event: Dict[str, Any]) -> str:
-    payload = event.get("payload")
+    text = _stringify_payload(event.get("payload"))
+    if text is not None:
+        return text
+    if event.get("message"):
+        return str(event["message"])
+    return "(no payload)"
+
+
+def _stringify_payload(payload: Any) -> Optional[str]:
     if isinstance(payload, str):
         return payload
     if isinstance(payload, dict):
+        if all(type(key) is str and type(value) in _SCALAR_TYPES for key, value in payload.items()):
+            # Value types are part of the key so that e.g. 1, 1.0 and True stay
+            # distinct; floats are keyed by repr, since -0.0 == 0.0 hash alike.
+            return _dumps_flat(tuple(sorted(
+                (key, float, repr(value)) if type(value) is float else (key, type(value), value)
+                for key, value in payload.items()
+            )))
         return json.dumps(payload, sort_keys=True)
-    if event.get("message"):
-        return str(event["message"])
-    return "(no payload)"
+    return None
+
+
+@functools.lru_cache(maxsize=8192)
+def _dumps_flat(items: Tuple[Tuple[str, type, Any], ...]) -> str:
+    return json.dumps(
+        {key: float(value) if kind is float else value for key, kind, value in items},
+        sort_keys=True,
+    )
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
-from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple
+import threading
+from typing import Any, AsyncIterator, Dict, Generator, Iterable, Iterator, List, Optional, Tuple
 
 import httpx
+import orjson
 
 from .agent_store import Agent
+from .conversation_manager import format_turn
 from .settings import get_settings, Settings
 
 
@@ -26,6 +29,8 @@ class StreamingLLMEngine:
         self.eos_token_id = None
         self.kv_cache = None
         self.torch = None
+        self._ollama_client: Optional[httpx.Client] = None
+        self._ollama_client_lock = threading.Lock()
 
         if self.provider == "ollama":
             logger.info(
@@ -46,12 +51,12 @@ class StreamingLLMEngine:
         sections.append(f"System:\n{agent.system_prompt.strip()}")
         if agent.markdown_context.strip():
             sections.append(f"Context:\n{agent.markdown_context.strip()}")
-        if history:
-            history_lines = []
-            for turn in history:
-                role = turn.get("role", "user").upper()
-                content = turn.get("content", "").strip()
-                history_lines.append(f"{role}: {content}")
+        # Turns from ConversationManager carry their pre-rendered line.
+        history_lines = [
+            turn["line"] if "line" in turn else format_turn(turn.get("role", "user"), turn.get("content", ""))
+            for turn in history
+        ]
+        if history_lines:
             sections.append("Conversation History:\n" + "\n".join(history_lines))
         sections.append(f"USER: {user_message.strip()}\nASSISTANT:")
         return "\n\n".join(sections)
@@ -71,7 +76,7 @@ class StreamingLLMEngine:
 
         torch = self.torch
         max_tokens = max_new_tokens or self.settings.max_new_tokens
-        with torch.no_grad():
+        with torch.inference_mode():
             input_ids = self.tokenizer(
                 prompt,
                 return_tensors="pt",
@@ -80,36 +85,124 @@ class StreamingLLMEngine:
             if self.kv_cache is not None:
                 space_needed = input_ids.shape[1] + max_tokens
                 past_key_values = self.kv_cache.evict_for_space(None, space_needed)
-            outputs = self.model(
+            # return_dict=False yields (logits, past_key_values, ...) without
+            # building a ModelOutput per step.
+            logits, past_key_values = self.model(
                 input_ids=input_ids,
                 past_key_values=past_key_values,
                 use_cache=True,
-            )
-            past_key_values = outputs.past_key_values
+                return_dict=False,
+            )[:2]
+            step_input = torch.empty((1, 1), dtype=torch.long, device=self.device)
             generated_ids: List[int] = []
-            prev_text = ""
-            next_token = None
+            prefix_offset = 0
+            read_offset = 0
             for _ in range(max_tokens):
-                logits = outputs.logits[:, -1, :]
-                next_token = self._sample_next_token(logits, temperature)
-                generated_ids.append(next_token.item())
-                decoded_text = self.tokenizer.decode(
+                next_token = self._sample_next_token(logits[:, -1, :], temperature)
+                token_id = next_token.item()
+                generated_ids.append(token_id)
+                delta, prefix_offset, read_offset = self._decode_delta(
                     generated_ids,
-                    skip_special_tokens=True,
-                    clean_up_tokenization_spaces=True,
+                    prefix_offset,
+                    read_offset,
                 )
-                delta = decoded_text[len(prev_text) :]
                 if delta:
-                    prev_text = decoded_text
                     yield delta
-                if next_token.item() == self.eos_token_id:
+                if token_id == self.eos_token_id:
                     break
-                outputs = self.model(
-                    input_ids=next_token.to(self.device),
+                step_input.copy_(next_token)
+                logits, past_key_values = self.model(
+                    input_ids=step_input,
                     past_key_values=past_key_values,
                     use_cache=True,
-                )
-                past_key_values = outputs.past_key_values
+                    return_dict=False,
+                )[:2]
+
+    async def astream(
+        self,
+        prompt: str,
+        max_new_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        max_batch: int = 1,
+    ) -> AsyncIterator[str]:
+        """Async view of :meth:`stream` for use on the event loop.
+
+        Generation runs once on the default executor and hands tokens back
+        with ``call_soon_threadsafe``, so the loop never blocks on a
+        per-token future. Up to ``max_batch`` tokens that are already
+        waiting are joined into one item; nothing waits for more to arrive.
+        Closing the iterator stops the worker at the next token.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[Tuple[str, Any]] = asyncio.Queue()
+        stop = threading.Event()
+
+        def push(kind: str, value: Any = None) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+            except RuntimeError:  # loop already closed
+                stop.set()
+
+        def produce() -> None:
+            try:
+                for token in self.stream(prompt, max_new_tokens, temperature):
+                    if stop.is_set():
+                        return
+                    push("token", token)
+            except Exception as exc:  # noqa: BLE001 - re-raised on the loop
+                push("error", exc)
+            else:
+                push("done")
+
+        loop.run_in_executor(None, produce)
+        held: Optional[Tuple[str, Any]] = None
+        try:
+            while True:
+                kind, value = held or await queue.get()
+                held = None
+                if kind == "token":
+                    if max_batch > 1 and not queue.empty():
+                        parts = [value]
+                        while len(parts) < max_batch and not queue.empty():
+                            item = queue.get_nowait()
+                            if item[0] != "token":
+                                held = item
+                                break
+                            parts.append(item[1])
+                        value = "".join(parts)
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            stop.set()
+
+    def _decode_delta(
+        self,
+        token_ids: List[int],
+        prefix_offset: int,
+        read_offset: int,
+    ) -> Tuple[str, int, int]:
+        """Decode only the tokens appended since ``read_offset``.
+
+        ``token_ids[prefix_offset:read_offset]`` is re-decoded as left context so
+        that merges and leading spaces come out right; the text is held back
+        while it ends in an incomplete UTF-8 sequence.
+        """
+        prefix_text = self.tokenizer.decode(
+            token_ids[prefix_offset:read_offset],
+            skip_special_tokens=True,
+            clean_up_tokenization_spaces=True,
+        )
+        new_text = self.tokenizer.decode(
+            token_ids[prefix_offset:],
+            skip_special_tokens=True,
+            clean_up_tokenization_spaces=True,
+        )
+        if len(new_text) > len(prefix_text) and not new_text.endswith("\ufffd"):
+            return new_text[len(prefix_text) :], read_offset, len(token_ids)
+        return "", prefix_offset, read_offset
 
     def _stream_from_ollama(
         self,
@@ -131,30 +224,40 @@ class StreamingLLMEngine:
         if options:
             payload["options"] = options
         url = f"{self.ollama_base_url}/api/generate"
+        client = self._ensure_ollama_client()
         try:
-            with httpx.Client(timeout=None) as client:
-                with client.stream("POST", url, json=payload) as response:
-                    response.raise_for_status()
-                    for line in response.iter_lines():
-                        if not line:
-                            continue
-                        if isinstance(line, bytes):
-                            line = line.decode("utf-8")
-                        line = line.strip()
-                        if not line:
-                            continue
-                        chunk = json.loads(line)
-                        error = chunk.get("error")
-                        if error:
-                            raise RuntimeError(f"Ollama error: {error}")
-                        token = chunk.get("response") or ""
-                        if token:
-                            yield token
-                        if chunk.get("done"):
-                            break
+            with client.stream("POST", url, json=payload) as response:
+                response.raise_for_status()
+                for chunk in _iter_ndjson(response):
+                    error = chunk.get("error")
+                    if error:
+                        raise RuntimeError(f"Ollama error: {error}")
+                    token = chunk.get("response") or ""
+                    if token:
+                        yield token
+                    if chunk.get("done"):
+                        break
         except httpx.HTTPError as exc:
             raise RuntimeError(f"Ollama request failed: {exc}") from exc
 
+    def close(self) -> None:
+        """Release pooled HTTP connections."""
+        with self._ollama_client_lock:
+            client, self._ollama_client = self._ollama_client, None
+        if client is not None:
+            client.close()
+
+    def _ensure_ollama_client(self) -> httpx.Client:
+        # One keep-alive pool shared by every stream() call.
+        if self._ollama_client is None:
+            with self._ollama_client_lock:
+                if self._ollama_client is None:
+                    self._ollama_client = httpx.Client(
+                        timeout=None,
+                        limits=httpx.Limits(max_keepalive_connections=4),
+                    )
+        return self._ollama_client
+
     def _sample_next_token(self, logits: Any, temperature: Optional[float]):
         if self.torch is None:
             raise RuntimeError("PyTorch is required for local Transformer sampling")
@@ -209,3 +312,26 @@ class StreamingLLMEngine:
         if ":" in clean and "/" not in clean:
             return "ollama", clean
         return "hf", clean
+
+
+def _iter_ndjson(response: httpx.Response) -> Iterator[Dict[str, Any]]:
+    """Parse a newline-delimited JSON body straight from its bytes.
+
+    Chunks are yielded as they arrive (no ``chunk_size``) so tokens are not
+    held back waiting for a full buffer.
+    """
+    buffer = bytearray()
+    for data in response.iter_bytes():
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = buffer[start:end]
+            start = end + 1
+            if line.strip():
+                yield orjson.loads(line)
+        del buffer[:start]
+    if buffer.strip():
+        yield orjson.loads(buffer)
@@ -1,21 +1,22 @@
 from __future__ import annotations
 
-import json
-import os
+import re
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import orjson
+
+from backend.data_paths import DataPaths, data_paths
 from backend.log import query as log_query
 from backend.log import summarize as log_summarize
 
 MODULE_ROOT = Path(__file__).resolve().parents[2]
 PROMPT_ROOT = MODULE_ROOT / "orchestrator" / "prompts"
-DATA_ROOT = Path(os.environ.get("STREAMING_LLM_DATA_DIR") or (MODULE_ROOT / "data"))
-LOG_ROOT = DATA_ROOT / "logs"
-SUMMARY_ROOT = DATA_ROOT / "summaries"
 
-SPEAK_HINTS = {"user_waiting", "task_completed", "agent_failed"}
-TRIGGER_EVENT_TYPES = {"ERROR", "AGENT_RESULT"}
+SPEAK_HINTS = frozenset({"user_waiting", "task_completed", "agent_failed"})
+TRIGGER_EVENT_TYPES = frozenset({"ERROR", "AGENT_RESULT"})
+_prepared_paths: Optional[DataPaths] = None
+PLACEHOLDER_PATTERN = re.compile(r"(\{\{[A-Z_]+\}\})")
 
 
 class ControllerRunner:
@@ -24,6 +25,8 @@ class ControllerRunner:
         self.prompt_dir = prompt_dir or PROMPT_ROOT
         self.controller_template = (self.prompt_dir / "controller.md").read_text(encoding="utf-8")
         self.narrator_template = (self.prompt_dir / "narrator.md").read_text(encoding="utf-8")
+        self._controller_parts, self._controller_slots = _compile_template(self.controller_template)
+        self._narrator_parts, self._narrator_slots = _compile_template(self.narrator_template)
 
     def build_controller_prompt(
         self,
@@ -43,17 +46,16 @@ class ControllerRunner:
             "{{EVENT_FOCUS}}": context,
             "{{ACTION_GUIDE}}": "Return JSON {\"actions\": [...], \"speak_now\": bool, \"notes\": string}. Include attention_hints you considered: " + ", ".join(hints or []),
         }
-        prompt = self.controller_template
-        for token, value in placeholder_values.items():
-            prompt = prompt.replace(token, value)
-        return prompt
+        return _render_template(self._controller_parts, self._controller_slots, placeholder_values)
 
     def decide(self, hints: Optional[List[str]], recent_events: List[Dict[str, Any]]) -> Dict[str, Any]:
         hints = hints or []
-        speak = any(h in SPEAK_HINTS for h in hints)
+        speak = not SPEAK_HINTS.isdisjoint(hints)
         if not speak:
-            for event in reversed(recent_events[-5:]):
-                if event.get("type") in TRIGGER_EVENT_TYPES:
+            # Index the last five events in place instead of slicing a copy.
+            count = len(recent_events)
+            for index in range(count - 1, max(count - 6, -1), -1):
+                if recent_events[index].get("type") in TRIGGER_EVENT_TYPES:
                     speak = True
                     break
         decision = {
@@ -80,8 +82,7 @@ class ControllerRunner:
         conversation_id: str,
     ) -> Optional[str]:
         if not speak_now:
-            _sync_log_modules()
-            LOG_ROOT.mkdir(parents=True, exist_ok=True)
+            _ensure_data_dirs()
             log_query.append_event(
                 {
                     "conversation_id": conversation_id,
@@ -93,26 +94,17 @@ class ControllerRunner:
             return None
         placeholder_values = {
             "{{NARRATION_CONTEXT}}": context_markdown.strip() or "No recent context.",
-            "{{USER_CONTEXT}}": json.dumps(actions, ensure_ascii=False),
+            "{{USER_CONTEXT}}": orjson.dumps(actions).decode("utf-8"),
             "{{SPEAK_INSTRUCTIONS}}": "Respond concisely and acknowledge prior context before sharing new insights.",
         }
-        prompt = self.narrator_template
-        for token, value in placeholder_values.items():
-            prompt = prompt.replace(token, value)
-        return prompt
+        return _render_template(self._narrator_parts, self._narrator_slots, placeholder_values)
 
 
 def build_context_slice(conversation_id: str, events: List[Dict[str, Any]], max_events: int = 30) -> str:
-    _sync_log_modules()
-    LOG_ROOT.mkdir(parents=True, exist_ok=True)
-    SUMMARY_ROOT.mkdir(parents=True, exist_ok=True)
+    _ensure_data_dirs()
     kept = events[-max_events:]
     trimmed = events[:-max_events]
-    lines = []
-    for event in kept:
-        label = event.get("type", "EVENT")
-        payload = _render_payload(event.get("payload"))
-        lines.append(f"- [{label}] {payload}")
+    body = "\n".join([_render_event(event) for event in kept])
     summary_section = ""
     if trimmed:
         summary = log_summarize.rolling_summary(conversation_id, trimmed)
@@ -128,22 +120,48 @@ def build_context_slice(conversation_id: str, events: List[Dict[str, Any]], max_
         summary_section = (
             f"\n### Summaries\n- Ref {summary['summary_ref']} (see summaries/{conversation_id}.md)"
         )
-    return "\n".join(lines) + summary_section
-
-
-def _render_payload(payload: Any) -> str:
-    if payload is None:
-        return "(no payload)"
-    if isinstance(payload, str):
-        return payload
-    return json.dumps(payload, ensure_ascii=False, sort_keys=True)
-
-
-def _sync_log_modules() -> None:
-    """Keep log module roots aligned with controller runner data dir."""
-    if getattr(log_query, "LOG_ROOT", None) != LOG_ROOT:
-        log_query.DATA_ROOT = DATA_ROOT
-        log_query.LOG_ROOT = LOG_ROOT
-    if getattr(log_summarize, "SUMMARIES_ROOT", None) != SUMMARY_ROOT:
-        log_summarize.DATA_ROOT = DATA_ROOT
-        log_summarize.SUMMARIES_ROOT = SUMMARY_ROOT
+    return body + summary_section
+
+
+def _compile_template(template: str) -> Tuple[List[str], Dict[str, List[int]]]:
+    """Split a prompt template into literal segments and placeholder slots."""
+    parts = PLACEHOLDER_PATTERN.split(template)
+    slots: Dict[str, List[int]] = {}
+    # re.split with one capture group puts placeholders at the odd indices.
+    for index in range(1, len(parts), 2):
+        slots.setdefault(parts[index], []).append(index)
+    return parts, slots
+
+
+def _render_template(parts: List[str], slots: Dict[str, List[int]], values: Dict[str, str]) -> str:
+    filled = parts.copy()
+    for token, value in values.items():
+        for index in slots.get(token, ()):
+            filled[index] = value
+    return "".join(filled)
+
+
+def _render_event(
+    event: Dict[str, Any],
+    _str=str,
+    _dumps=orjson.dumps,
+    _options=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+) -> str:
+    payload = event.get("payload")
+    if not isinstance(payload, _str):
+        if payload is None:
+            payload = "(no payload)"
+        else:
+            payload = _dumps(payload, option=_options).decode("utf-8")
+    return f"- [{event.get('type', 'EVENT')}] {payload}"
+
+
+def _ensure_data_dirs() -> None:
+    """Create the log and summary dirs once per resolved data layout."""
+    global _prepared_paths
+    paths = data_paths()
+    if paths is _prepared_paths:
+        return
+    paths.logs.mkdir(parents=True, exist_ok=True)
+    paths.summaries.mkdir(parents=True, exist_ok=True)
+    _prepared_paths = paths
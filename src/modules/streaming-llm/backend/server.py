@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-import asyncio
-import json
 import logging
+from contextlib import aclosing
 from typing import Any, Dict, Optional
 
+import orjson
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 from .agent_store import AgentStore
@@ -31,6 +32,11 @@ def get_engine() -> StreamingLLMEngine:
     return engine
 
 
+def close_engine() -> None:
+    if engine is not None:
+        engine.close()
+
+
 class AgentPayload(BaseModel):
     id: str
     name: str
@@ -48,7 +54,11 @@ class AgentListResponse(BaseModel):
     agents: list[AgentPayload]
 
 
-app = FastAPI(title="StreamingLLM Multi-Agent Backend")
+app = FastAPI(
+    title="StreamingLLM Multi-Agent Backend",
+    default_response_class=ORJSONResponse,
+    on_shutdown=[close_engine],
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -66,9 +76,10 @@ def healthcheck() -> Dict[str, str]:
 
 
 @app.get("/agents", response_model=AgentListResponse)
-def list_agents() -> AgentListResponse:
-    agents = [AgentPayload(**agent.to_dict()) for agent in agent_store.list_agents()]
-    return AgentListResponse(agents=agents)
+def list_agents() -> ORJSONResponse:
+    # Returning a Response skips response_model validation; the model is kept
+    # for the OpenAPI schema only.
+    return ORJSONResponse({"agents": [agent.to_dict() for agent in agent_store.list_agents()]})
 
 
 @app.get("/agents/{agent_id}", response_model=AgentPayload)
@@ -103,7 +114,6 @@ def delete_agent(agent_id: str) -> Response:
 @app.websocket("/ws/chat")
 async def chat(websocket: WebSocket) -> None:
     await websocket.accept()
-    loop = asyncio.get_running_loop()
 
     while True:
         try:
@@ -112,8 +122,8 @@ async def chat(websocket: WebSocket) -> None:
             break
 
         try:
-            payload = json.loads(raw)
-        except json.JSONDecodeError:
+            payload = orjson.loads(raw)
+        except orjson.JSONDecodeError:
             await _send_ws_error(websocket, "Invalid JSON")
             await websocket.close()
             return
@@ -135,7 +145,7 @@ async def chat(websocket: WebSocket) -> None:
 
         try:
             conversation_id = conversation_manager.ensure(payload.get("conversation_id"))
-            history = conversation_manager.history(conversation_id)
+            history = conversation_manager.snapshot(conversation_id)
             if user_message:
                 conversation_manager.append(conversation_id, "USER", user_message)
             prompt = get_engine().build_prompt(agent, history, user_message)
@@ -148,35 +158,37 @@ async def chat(websocket: WebSocket) -> None:
         assistant_chunks: list[str] = []
         cancelled = False
 
-        def send_event(event: Dict[str, Any]) -> None:
+        async def send_event(event: Dict[str, Any]) -> None:
             event.setdefault("conversation_id", conversation_id)
             try:
-                asyncio.run_coroutine_threadsafe(
-                    websocket.send_text(json.dumps(event)),
-                    loop,
-                ).result()
-            except WebSocketDisconnect as exc:
-                raise StreamCancelled from exc
-            except RuntimeError as exc:
+                await websocket.send_bytes(orjson.dumps(event))
+            except (WebSocketDisconnect, RuntimeError) as exc:
                 raise StreamCancelled from exc
 
-        def run_generation() -> None:
-            nonlocal cancelled
-            try:
-                for token in get_engine().stream(
+        # One token event per stream, refilled for each chunk before encoding.
+        token_event: Dict[str, Any] = {"type": "token", "token": "", "conversation_id": conversation_id}
+        try:
+            async with aclosing(
+                get_engine().astream(
                     prompt=prompt,
                     temperature=_safe_float(options.get("temperature")),
                     max_new_tokens=_safe_int(options.get("max_new_tokens")),
-                ):
+                    max_batch=settings.token_batch_max,
+                )
+            ) as tokens:
+                async for token in tokens:
                     assistant_chunks.append(token)
-                    send_event({"type": "token", "token": token})
-                send_event({"type": "done"})
+                    token_event["token"] = token
+                    await send_event(token_event)
+            await send_event({"type": "done"})
+        except StreamCancelled:
+            cancelled = True
+        except Exception as exc:  # noqa: BLE001 - surface model errors
+            try:
+                await send_event({"type": "error", "message": str(exc)})
             except StreamCancelled:
                 cancelled = True
-            except Exception as exc:  # noqa: BLE001 - surface model errors
-                send_event({"type": "error", "message": str(exc)})
 
-        await loop.run_in_executor(None, run_generation)
         assistant_text = "".join(assistant_chunks).strip()
         if assistant_text and not cancelled:
             conversation_manager.append(conversation_id, "ASSISTANT", assistant_text)
@@ -205,7 +217,7 @@ def _safe_int(value: Any) -> Optional[int]:
 
 async def _send_ws_error(websocket: WebSocket, message: str) -> None:
     try:
-        await websocket.send_text(json.dumps({"type": "error", "message": message}))
+        await websocket.send_bytes(orjson.dumps({"type": "error", "message": message}))
     except Exception:  # noqa: BLE001
         logger.debug("Unable to send websocket error message", exc_info=True)
 
@@ -213,4 +225,13 @@ async def _send_ws_error(websocket: WebSocket, message: str) -> None:
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("backend.server:app", host="0.0.0.0", port=8000, reload=False)
+    uvicorn.run(
+        "backend.server:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=False,
+        loop="uvloop",
+        http="httptools",
+        ws="websockets",
+        access_log=False,
+    )
@@ -1,4 +1,3 @@
-from functools import lru_cache
 from pathlib import Path
 import os
 from pydantic import BaseModel
@@ -18,11 +17,16 @@ class Settings(BaseModel):
         os.environ.get("STREAMING_LLM_AGENTS_DIR") or DEFAULT_AGENTS_DIR
     )
     max_new_tokens: int = int(os.environ.get("STREAMING_LLM_MAX_NEW_TOKENS", "512"))
+    token_batch_max: int = int(os.environ.get("STREAMING_LLM_TOKEN_BATCH", "16"))
     ollama_base_url: str = os.environ.get(
         "STREAMING_LLM_OLLAMA_URL", "http://127.0.0.1:11434"
     )
 
 
-@lru_cache()
+# Field defaults read the environment when the class is defined, so a single
+# instance built at import time is equivalent to building one per call.
+_SETTINGS = Settings()
+
+
 def get_settings() -> Settings:
-    return Settings()
+    return _SETTINGS
@@ -1,42 +1,145 @@
 from __future__ import annotations
 
-import json
+import atexit
+import heapq
 import os
-from datetime import datetime, timezone
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Set
+from typing import AbstractSet, BinaryIO, Collection, Dict, Any, Iterator, List, Optional, Tuple
 import uuid
 import fcntl
 
-DATA_ROOT = Path(os.environ.get("STREAMING_LLM_DATA_DIR") or Path(__file__).resolve().parents[2] / "data")
-GRAPH_PATH = DATA_ROOT / "tasks.graph.json"
+import orjson
+
+from backend.data_paths import data_paths
+
+
+# Same layout as json.dumps(indent=2) and the workspace narrator's
+# JSON.stringify(graph, null, 2), so both writers produce identical files.
+def _graph_dumps(graph: Dict[str, Any]) -> bytes:
+    return orjson.dumps(graph, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+
+
+def _deep_copy(value: Any) -> Any:
+    return orjson.loads(orjson.dumps(value))
+
+
+# Per-type, insertion-ordered sets of task ids that became PENDING in this
+# process. They are a dispatch hint only: claims are re-checked against the
+# graph, and tasks written by other processes (or dropped once a type holds
+# READY_QUEUE_SIZE ids) are found by scanning. Ids are removed as soon as this
+# process sees their task leave PENDING.
+READY_QUEUE_SIZE = 1024
+_READY: Dict[str, "OrderedDict[str, None]"] = {}
+_ready_lock = threading.Lock()
+
+# Block size used when looking for the first byte a graph rewrite changes.
+GRAPH_COMPARE_BLOCK = 64 * 1024
+
+
+class _CachedGraph:
+    """Bytes of the graph file as last read or written, keyed by path and
+    (st_mtime_ns, st_size).
+
+    The JSON file stays the source of truth because the TypeScript server
+    reads and writes it too; the cache only skips re-reading a file nobody has
+    touched. Callers get their own parse of ``raw``; the shared parse and the
+    status index built on it never leave this module.
+    """
+
+    __slots__ = ("key", "raw", "_parsed", "_by_status")
+
+    def __init__(self, key: Tuple[Path, int, int], raw: bytes) -> None:
+        self.key = key
+        self.raw = raw
+        self._parsed: Optional[Dict[str, Any]] = None
+        self._by_status: Optional[Dict[Any, List[Tuple[int, Dict[str, Any]]]]] = None
+
+    def fresh(self) -> Dict[str, Any]:
+        """Return a private parse of the graph that the caller may mutate."""
+        return _parse_graph(self.raw)
+
+    def shared(self) -> Dict[str, Any]:
+        """Return the shared parse; it must not be mutated or handed out."""
+        if self._parsed is None:
+            self._parsed = _parse_graph(self.raw)
+        return self._parsed
+
+    def by_status(self) -> Dict[Any, List[Tuple[int, Dict[str, Any]]]]:
+        """Tasks of the shared parse grouped by status as (position, task) pairs."""
+        if self._by_status is None:
+            index: Dict[Any, List[Tuple[int, Dict[str, Any]]]] = {}
+            for position, task in enumerate(self.shared()["tasks"]):
+                index.setdefault(task.get("status"), []).append((position, task))
+            self._by_status = index
+        return self._by_status
+
+
+_graph_cache: Optional[_CachedGraph] = None
+
+# Long-lived unbuffered handle on the graph file, reopened when the path changes or
+# the file is unlinked or replaced underneath it. flock belongs to the open
+# file, so threads in this process also serialize on _graph_lock.
+_graph_file: Optional[BinaryIO] = None
+_graph_lock = threading.RLock()
+# Graph yielded by the outermost locked_graph() block. Only the thread holding
+# _graph_lock can observe it set.
+_open_graph: Optional[Dict[str, Any]] = None
 
 
 def load_graph() -> Dict[str, Any]:
-    _ensure_graph_file()
-    with GRAPH_PATH.open("r", encoding="utf-8") as handle:
-        _lock(handle, fcntl.LOCK_SH)
-        data = json.load(handle)
-        _lock(handle, fcntl.LOCK_UN)
-    if "tasks" not in data:
-        data["tasks"] = []
-    return data
+    """Return a private copy of the task graph."""
+    with _shared_graph() as cached:
+        return cached.fresh()
 
 
 def save_graph(graph: Dict[str, Any]) -> None:
-    GRAPH_PATH.parent.mkdir(parents=True, exist_ok=True)
     graph.setdefault("tasks", [])
-    with GRAPH_PATH.open("w", encoding="utf-8") as handle:
+    with _graph_lock:
+        handle = _graph_handle()
         _lock(handle, fcntl.LOCK_EX)
-        json.dump(graph, handle, ensure_ascii=False, indent=2)
-        handle.write("\n")
-        handle.flush()
-        os.fsync(handle.fileno())
-        _lock(handle, fcntl.LOCK_UN)
+        try:
+            _write_graph(handle, _graph_dumps(graph))
+        finally:
+            _lock(handle, fcntl.LOCK_UN)
+
+
+@contextmanager
+def locked_graph() -> Iterator[Dict[str, Any]]:
+    """Hold the graph file exclusively across a read-modify-write.
+
+    The yielded graph is a private parse, written back when the block exits
+    normally and its serialised form changed; an exception leaves the file
+    untouched. Nested blocks, including those inside create_task() and
+    update_task(), share the outermost graph, so the whole block costs one
+    read and one write.
+    """
+    global _open_graph
+    with _graph_lock:
+        if _open_graph is not None:
+            yield _open_graph
+            return
+        handle = _graph_handle()
+        _lock(handle, fcntl.LOCK_EX)
+        try:
+            cached = _read_graph(handle)
+            graph = _open_graph = cached.fresh()
+            try:
+                yield graph
+            finally:
+                _open_graph = None
+            payload = _graph_dumps(graph)
+            if payload != cached.raw:
+                _write_graph(handle, payload, cached.raw)
+        finally:
+            _lock(handle, fcntl.LOCK_UN)
 
 
 def create_task(task: Dict[str, Any]) -> Dict[str, Any]:
-    graph = load_graph()
     now = _now_iso()
     node = {
         "id": task.get("id", f"task-{uuid.uuid4().hex}"),
@@ -54,40 +157,206 @@ def create_task(task: Dict[str, Any]) -> Dict[str, Any]:
         "parent_id": task.get("parent_id"),
         "dependency_ids": task.get("dependency_ids", []),
     }
-    graph.setdefault("tasks", []).append(node)
-    save_graph(graph)
+    with locked_graph() as graph:
+        graph["tasks"].append(node)
+    if node["status"] == "PENDING":
+        _mark_ready(node["type"], node["id"])
     return node
 
 
 def update_task(task_id: str, **patch: Any) -> Dict[str, Any]:
-    graph = load_graph()
-    for node in graph.get("tasks", []):
-        if node["id"] == task_id:
-            node.update(patch)
+    with locked_graph() as graph:
+        for node in graph["tasks"]:
+            if node["id"] == task_id:
+                node.update(patch)
+                node["updated_at"] = _now_iso()
+                break
+        else:
+            raise KeyError(f"task {task_id} not found")
+    if patch.get("status") == "PENDING":
+        _mark_ready(node["type"], node["id"])
+    elif "status" in patch:
+        _unmark_ready(node["type"], node["id"])
+    return node
+
+
+def claim_task(task_id: str, owner: str) -> Optional[Dict[str, Any]]:
+    """Move a PENDING task to IN_PROGRESS for ``owner``.
+
+    Returns None when the task is gone or no longer pending.
+    """
+    with locked_graph() as graph:
+        for node in graph["tasks"]:
+            if node["id"] != task_id:
+                continue
+            _unmark_ready(node.get("type"), task_id)
+            if node.get("status") != "PENDING":
+                return None
+            node.update(status="IN_PROGRESS", owner=owner, attempt=node.get("attempt", 0) + 1)
             node["updated_at"] = _now_iso()
-            save_graph(graph)
             return node
-    raise KeyError(f"task {task_id} not found")
+    return None
+
+
+def next_ready(task_type: str) -> Optional[str]:
+    """Pop the oldest id of a task of ``task_type`` that became PENDING in this
+    process, or None. The task may have been claimed elsewhere since."""
+    with _ready_lock:
+        ready = _READY.get(task_type)
+        if not ready:
+            return None
+        return ready.popitem(last=False)[0]
+
 
+def list_active(statuses: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+    """Return copies of the tasks in ``statuses`` (all tasks if empty), in graph order."""
+    with _shared_graph() as cached:
+        if not statuses:
+            return cached.fresh()["tasks"]
+        index = cached.by_status()
+    if not isinstance(statuses, AbstractSet):
+        statuses = frozenset(statuses)
+    buckets = [index[status] for status in statuses if status in index]
+    if len(buckets) == 1:
+        tasks = [task for _, task in buckets[0]]
+    else:
+        tasks = [task for _, task in heapq.merge(*buckets, key=itemgetter(0))]
+    return _deep_copy(tasks)
 
-def list_active(statuses: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
-    graph = load_graph()
-    tasks = graph.get("tasks", [])
-    if not statuses:
-        return list(tasks)
-    wanted = set(statuses)
-    return [task for task in tasks if task.get("status") in wanted]
+
+def _mark_ready(task_type: str, task_id: str) -> None:
+    with _ready_lock:
+        ready = _READY.get(task_type)
+        if ready is None:
+            ready = _READY[task_type] = OrderedDict()
+        ready[task_id] = None
+        ready.move_to_end(task_id)
+        while len(ready) > READY_QUEUE_SIZE:
+            ready.popitem(last=False)
+
+
+def _unmark_ready(task_type: Any, task_id: str) -> None:
+    with _ready_lock:
+        ready = _READY.get(task_type)
+        if ready is not None:
+            ready.pop(task_id, None)
 
 
 def _ensure_graph_file() -> None:
-    GRAPH_PATH.parent.mkdir(parents=True, exist_ok=True)
-    if not GRAPH_PATH.exists():
-        GRAPH_PATH.write_text('{"tasks": []}', encoding="utf-8")
+    graph_path = data_paths().graph
+    graph_path.parent.mkdir(parents=True, exist_ok=True)
+    if not graph_path.exists():
+        graph_path.write_text('{"tasks": []}', encoding="utf-8")
+
+
+@contextmanager
+def _shared_graph() -> Iterator[_CachedGraph]:
+    """Yield the cached graph under a shared lock."""
+    with _graph_lock:
+        handle = _graph_handle()
+        _lock(handle, fcntl.LOCK_SH)
+        try:
+            yield _read_graph(handle)
+        finally:
+            _lock(handle, fcntl.LOCK_UN)
+
+
+def _read_graph(handle) -> _CachedGraph:
+    """Return the locked graph file's contents, reusing the cache while it is unchanged."""
+    global _graph_cache
+    key = _stat_key(handle)
+    cached = _graph_cache
+    if cached is not None and cached.key == key:
+        return cached
+    handle.seek(0)
+    _graph_cache = cached = _CachedGraph(key, handle.read())
+    return cached
+
+
+def _parse_graph(raw: bytes) -> Dict[str, Any]:
+    data = orjson.loads(raw)
+    if "tasks" not in data:
+        data["tasks"] = []
+    return data
+
+
+def _write_graph(handle, payload: bytes, current: Optional[bytes] = None) -> None:
+    global _graph_cache
+    _graph_cache = None
+    fd = handle.fileno()
+    # The file must stay a plain JSON document for the workspace narrator, so
+    # rather than journaling changes, only the bytes from the first difference
+    # with what is on disk are rewritten; appended or late tasks touch the tail.
+    # Callers that read the file under this lock pass those bytes as ``current``.
+    if current is None:
+        current = os.pread(fd, os.fstat(fd).st_size, 0)
+    offset = _common_prefix_length(current, payload)
+    view = memoryview(payload)[offset:]
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+    os.ftruncate(fd, len(payload))
+    os.fsync(fd)
+    _graph_cache = _CachedGraph(_stat_key(handle), payload)
+
+
+def _common_prefix_length(old: bytes, new: bytes) -> int:
+    limit = min(len(old), len(new))
+    left, right = memoryview(old), memoryview(new)
+    start = 0
+    while start < limit and left[start:start + GRAPH_COMPARE_BLOCK] == right[start:start + GRAPH_COMPARE_BLOCK]:
+        start += GRAPH_COMPARE_BLOCK
+    end = min(start + GRAPH_COMPARE_BLOCK, limit)
+    # Bisect the first differing block; the prefix [start, mid) is compared in C.
+    while start < end:
+        mid = (start + end + 1) // 2
+        if left[start:mid] == right[start:mid]:
+            start = mid
+        else:
+            end = mid - 1
+    return min(start, limit)
+
+
+def _graph_handle() -> BinaryIO:
+    global _graph_file
+    handle = _graph_file
+    if handle is not None:
+        if handle.name == str(data_paths().graph) and os.fstat(handle.fileno()).st_nlink:
+            return handle
+        handle.close()
+    _ensure_graph_file()
+    _graph_file = handle = open(data_paths().graph, "r+b", buffering=0)
+    return handle
+
+
+def close_graph() -> None:
+    """Close the graph file handle and drop the cached graph.
+
+    The next access reopens and re-reads the file.
+    """
+    global _graph_file, _graph_cache
+    with _graph_lock:
+        _graph_cache = None
+        if _graph_file is not None:
+            _graph_file.close()
+            _graph_file = None
+
+
+def _stat_key(handle) -> Tuple[Path, int, int]:
+    stat = os.fstat(handle.fileno())
+    return data_paths().graph, stat.st_mtime_ns, stat.st_size
 
 
 def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    # Formatted straight from time_ns with a fixed six fractional digits;
+    # isoformat() drops the fraction entirely when microsecond == 0.
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{nanos // 1000:06d}Z"
 
 
 def _lock(handle, mode) -> None:
     fcntl.flock(handle.fileno(), mode)
+
+
+atexit.register(close_graph)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterator
+
+import pytest
+
+from backend.agents import base, runtime
+from backend.data_paths import use_data_dir
+from backend.log import query, summarize
+from backend.orchestrator import controller_runner
+from backend.task_graph import store
+
+DATA_FOLDERS = ("logs", "summaries", "archive")
+EMPTY_GRAPH = b'{"tasks": []}'
+
+
+@pytest.fixture
+def data_dir(tmp_path) -> Iterator[Path]:
+    """Fresh sidecar data layout under ``tmp_path``, active via use_data_dir()."""
+    path = tmp_path / "data"
+    # Built rather than hardlinked from a template: the store rewrites
+    # tasks.graph.json in place, which would leak into the shared inode.
+    path.mkdir()
+    for folder in DATA_FOLDERS:
+        (path / folder).mkdir()
+    (path / "tasks.graph.json").write_bytes(EMPTY_GRAPH)
+    with use_data_dir(path):
+        yield path
+
+
+@pytest.fixture
+def backend_modules(data_dir, monkeypatch) -> Iterator[SimpleNamespace]:
+    """The backend modules, imported once with this conftest, for use against ``data_dir``.
+
+    Modules resolve their paths through ``data_paths()``, so no reload is
+    needed; only per-process dispatch state is reset and the graph file
+    handle released afterwards.
+    """
+    monkeypatch.setattr(store, "_READY", {})
+    yield SimpleNamespace(
+        base=base,
+        runtime=runtime,
+        log_query=query,
+        log_summarize=summarize,
+        task_store=store,
+        controller_runner=controller_runner,
+    )
+    store.close_graph()
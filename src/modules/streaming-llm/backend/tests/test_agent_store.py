@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.agent_store import AgentStore
+
+
+@pytest.fixture
+def agent_store(tmp_path):
+    return AgentStore(tmp_path / "agents")
+
+
+def test_default_agents_use_plain_frontmatter(agent_store):
+    text = (agent_store.root / "planner.md").read_text()
+    assert text.startswith("---\nid: planner\nname: Planner\nsystem_prompt: You are Planner")
+    assert {agent.id for agent in agent_store.list_agents()} == {"planner", "researcher"}
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "Plain name",
+        "needs: quoting",
+        "hash # inside",
+        "123",
+        "yes",
+        "trailing ",
+        "quote's",
+        'multi\nline "quoted" \\ text',
+        "unicode \u00fc \U0001f600 \x85\x7f",
+    ],
+)
+def test_frontmatter_round_trips(agent_store, value):
+    agent_store.save_agent("custom", value, value, "## Notes\n")
+    agent = AgentStore(agent_store.root).get_agent("custom")
+    assert agent is not None
+    assert agent.name == value
+    assert agent.system_prompt == value
+    assert agent.markdown_context == "## Notes\n"
+
+
+def test_reload_reuses_unchanged_agents(agent_store):
+    planner = agent_store.get_agent("planner")
+    agent_store.reload()
+    assert agent_store.get_agent("planner") is planner
+
+    path = agent_store.root / "planner.md"
+    path.write_text(path.read_text().replace("name: Planner", "name: Lead Planner"))
+    agent_store.reload()
+    assert agent_store.get_agent("planner").name == "Lead Planner"
+
+    path.unlink()
+    agent_store.reload()
+    assert agent_store.get_agent("planner") is None
+
+
+def test_snapshot_warm_starts_without_parsing(agent_store, monkeypatch):
+    agent_store.save_agent("custom", "Custom", "Prompt", "Body\n")
+    agent_store.reload()
+    assert (agent_store.root / ".agents.cache.json").exists()
+
+    def fail_read(self, path):
+        raise AssertionError(f"unexpected parse of {path.name}")
+
+    monkeypatch.setattr(AgentStore, "_read_agent_file", fail_read)
+    warm = AgentStore(agent_store.root)
+    assert warm.get_agent("custom").markdown_context == "Body\n"
+    assert {agent.id for agent in warm.list_agents()} == {"planner", "researcher", "custom"}
+
+
+def test_concurrent_saves_of_one_agent_all_succeed(agent_store):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        saved = list(pool.map(
+            lambda index: agent_store.save_agent("custom", f"Custom {index}", "Prompt", "Body\n"),
+            range(4),
+        ))
+    assert len(saved) == 4
+    assert AgentStore(agent_store.root).get_agent("custom").name.startswith("Custom ")
+    assert not list(agent_store.root.glob("*.tmp"))
+
+
+def test_saves_keep_the_file_mode(agent_store):
+    path = agent_store.root / "planner.md"
+    path.chmod(0o600)
+    agent_store.save_agent("planner", "Planner", "Prompt", "Body\n")
+    assert path.stat().st_mode & 0o777 == 0o600
+
+    agent_store.save_agent("custom", "Custom", "Prompt", "Body\n")
+    umask = os.umask(0)
+    os.umask(umask)
+    assert (agent_store.root / "custom.md").stat().st_mode & 0o777 == 0o666 & ~umask
@@ -1,45 +1,21 @@
 from __future__ import annotations
 
-import importlib
 import json
-import sys
 from pathlib import Path
 from types import ModuleType
-from typing import Tuple
 
 import pytest
 
-BASE_MODULE = "backend.agents.base"
-RUNTIME_MODULE = "backend.agents.runtime"
-TASK_STORE_MODULE = "backend.task_graph.store"
-LOG_QUERY_MODULE = "backend.log.query"
-
-
-def _purge_backend_modules() -> None:
-    prefixes = ("backend.agents", "backend.task_graph", "backend.log")
-    for module_name in list(sys.modules.keys()):
-        if module_name.startswith(prefixes):
-            sys.modules.pop(module_name, None)
-
-
-def _load_agents(tmp_path: Path, monkeypatch) -> Tuple[ModuleType, ModuleType, ModuleType, ModuleType, Path]:
-    data_dir = tmp_path / "data"
-    (data_dir / "logs").mkdir(parents=True)
-    (data_dir / "summaries").mkdir()
-    (data_dir / "archive").mkdir()
-    (data_dir / "tasks.graph.json").write_text('{"tasks": []}')
-    monkeypatch.setenv("STREAMING_LLM_DATA_DIR", str(data_dir))
-    _purge_backend_modules()
-    base = importlib.import_module(BASE_MODULE)
-    runtime = importlib.import_module(RUNTIME_MODULE)
-    task_store = importlib.import_module(TASK_STORE_MODULE)
-    log_query = importlib.import_module(LOG_QUERY_MODULE)
-    return base, runtime, task_store, log_query, data_dir
-
 
 @pytest.fixture
-def agent_env(tmp_path, monkeypatch):
-    return _load_agents(tmp_path, monkeypatch)
+def agent_env(backend_modules, data_dir):
+    return (
+        backend_modules.base,
+        backend_modules.runtime,
+        backend_modules.task_store,
+        backend_modules.log_query,
+        data_dir,
+    )
 
 
 def _create_task(task_store: ModuleType, overrides: dict) -> dict:
@@ -142,6 +118,8 @@ def test_agent_runtime_claims_and_updates_tasks(agent_env):
     graph = task_store.load_graph()
     node = next(item for item in graph["tasks"] if item["id"] == claimed.id)
     assert node["status"] == "COMPLETED"
+    assert claimed.id not in runtime._last_update_at
+    assert claimed.id not in runtime._last_update_msg
 
 
 def test_runtime_rejects_user_visible_payloads(agent_env):
@@ -155,3 +133,39 @@ def test_runtime_rejects_user_visible_payloads(agent_env):
         runtime.emit_update(task, message="nope", extra={"render_to_user": True})
     assert getattr(exc_info.value, "policy_error", False) is True
     assert "user-visible" in str(exc_info.value)
+
+
+def test_runtime_skips_stale_ready_entries_and_scans_foreign_tasks(agent_env):
+    _, runtime_mod, task_store, _, _ = agent_env
+    stale = _create_task(task_store, {"type": "coder"})
+    task_store.update_task(stale["id"], status="IN_PROGRESS", owner="someone-else")
+    runtime = runtime_mod.AgentRuntime(agent_id="coder-2", agent_type="coder")
+    assert runtime.poll_next_task() is None
+
+    graph = task_store.load_graph()
+    graph["tasks"].append({"id": "task-foreign", "type": "coder", "status": "PENDING"})
+    task_store.save_graph(graph)
+    claimed = runtime.poll_next_task()
+    assert claimed is not None
+    assert claimed.id == "task-foreign"
+    assert claimed.attempt == 1
+
+
+def test_emit_update_coalesces_repeated_messages(agent_env):
+    base, runtime_mod, task_store, log_query, data_dir = agent_env
+    _create_task(task_store, {"type": "coder", "metadata": {"conversation_id": "conv-chatty"}})
+    runtime = runtime_mod.AgentRuntime(agent_id="coder-chatty", agent_type="coder", heartbeat_interval=60.0)
+    task = runtime.poll_next_task()
+    assert task is not None
+
+    runtime.emit_update(task, message="working")
+    runtime.emit_update(task, message="working")
+    runtime.emit_update(task, message="working", progress={"step": 2})
+    runtime.emit_update(task, message="almost done")
+    log_query.flush_pending()
+    entries = _read_log(data_dir / "logs" / "conv-chatty.jsonl")
+    assert [entry["payload"]["message"] for entry in entries] == ["working", "working", "almost done"]
+
+    runtime.fail_task(task, base.AgentError(task.id, "gave up"))
+    assert not runtime._last_update_at
+    assert not runtime._last_update_msg
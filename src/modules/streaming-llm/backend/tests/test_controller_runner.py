@@ -1,34 +1,16 @@
 from __future__ import annotations
 
-import importlib
 import json
-import sys
 from pathlib import Path
-from typing import List
 
 import pytest
 
-MODULE_PATH = "backend.orchestrator.controller_runner"
 STREAMING_ROOT = Path(__file__).resolve().parents[2]
 
 
-def _load_module(tmp_path: Path, monkeypatch):
-    data_dir = tmp_path / "data"
-    (data_dir / "logs").mkdir(parents=True)
-    (data_dir / "summaries").mkdir()
-    (data_dir / "archive").mkdir()
-    (data_dir / "tasks.graph.json").write_text('{"tasks": []}')
-    monkeypatch.setenv("STREAMING_LLM_DATA_DIR", str(data_dir))
-    if MODULE_PATH in sys.modules:
-        del sys.modules[MODULE_PATH]
-    module = importlib.import_module(MODULE_PATH)
-    module = importlib.reload(module)
-    return module, data_dir
-
-
 @pytest.fixture
-def controller_runner(tmp_path, monkeypatch):
-    return _load_module(tmp_path, monkeypatch)
+def controller_runner(backend_modules, data_dir):
+    return backend_modules.controller_runner, data_dir
 
 
 def test_prompt_templates_have_placeholders():
@@ -73,12 +55,19 @@ def test_context_slice_respects_budget(controller_runner):
     assert context.count("TASK_STATUS") == 30
     summary_file = data_dir / "summaries" / "conv-1.md"
     assert summary_file.exists()
+    module.log_query.flush_pending()
     logs_path = data_dir / "logs" / "conv-1.jsonl"
     assert logs_path.exists()
     log_entries = [json.loads(line) for line in logs_path.read_text().splitlines() if line.strip()]
     assert any(entry.get("type") == "SUMMARY_REFRESH" for entry in log_entries)
 
 
+def test_context_slice_renders_non_string_keys(controller_runner):
+    module, _ = controller_runner
+    context = module.build_context_slice("conv-keys", [{"type": "TOOL_RESULT", "payload": {2: "b", 1: "a"}}])
+    assert '- [TOOL_RESULT] {"1":"a","2":"b"}' in context
+
+
 def test_narrator_prompt_respects_gate(controller_runner):
     module, data_dir = controller_runner
     runner = module.ControllerRunner()
@@ -89,6 +78,7 @@ def test_narrator_prompt_respects_gate(controller_runner):
         conversation_id="conv-2"
     )
     assert narrative is None
+    module.log_query.flush_pending()
     logs_path = data_dir / "logs" / "conv-2.jsonl"
     assert logs_path.exists()
     entries = [json.loads(line) for line in logs_path.read_text().splitlines() if line.strip()]
@@ -101,4 +91,20 @@ def test_narrator_prompt_respects_gate(controller_runner):
         conversation_id="conv-2"
     )
     assert "context" in narrative
-    assert "done" in narrative
\ No newline at end of file
+    assert "done" in narrative
+
+
+def test_prompt_placeholders_fill_in_one_pass(controller_runner, tmp_path):
+    module, _ = controller_runner
+    prompt_dir = tmp_path / "prompts"
+    prompt_dir.mkdir()
+    (prompt_dir / "controller.md").write_text("{{SYSTEM_POLICY}}")
+    (prompt_dir / "narrator.md").write_text("{{NARRATION_CONTEXT}}|{{UNKNOWN}}|{{NARRATION_CONTEXT}}")
+    runner = module.ControllerRunner(prompt_dir=prompt_dir)
+    narrative = runner.build_narrator_prompt(
+        actions=[],
+        context_markdown="see {{SPEAK_INSTRUCTIONS}}",
+        speak_now=True,
+        conversation_id="conv-3",
+    )
+    assert narrative == "see {{SPEAK_INSTRUCTIONS}}|{{UNKNOWN}}|see {{SPEAK_INSTRUCTIONS}}"
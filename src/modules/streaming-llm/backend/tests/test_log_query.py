@@ -1,32 +1,16 @@
 from __future__ import annotations
 
-import importlib
-import os
-from pathlib import Path
-import sys
+import contextvars
+import json
+import threading
+import time
 
 import pytest
 
-MODULE_PATH = "backend.log.query"
-
-
-def _prepare_module(tmp_path: Path, monkeypatch) -> any:
-    data_dir = tmp_path / "data"
-    (data_dir / "logs").mkdir(parents=True)
-    (data_dir / "summaries").mkdir()
-    (data_dir / "archive").mkdir()
-    (data_dir / "tasks.graph.json").write_text('{"tasks": []}')
-    monkeypatch.setenv("STREAMING_LLM_DATA_DIR", str(data_dir))
-    if MODULE_PATH in sys.modules:
-        sys.modules.pop(MODULE_PATH)
-    module = importlib.import_module(MODULE_PATH)
-    module = importlib.reload(module)
-    return module
-
 
 @pytest.fixture
-def log_query(tmp_path, monkeypatch):
-    return _prepare_module(tmp_path, monkeypatch)
+def log_query(backend_modules):
+    return backend_modules.log_query
 
 
 def test_append_and_tail(log_query):
@@ -70,3 +54,181 @@ def test_since_and_by_type(log_query):
     filtered = log_query.by_type(["AGENT_UPDATE"], visibility="internal")
     assert len(filtered) == 1
     assert filtered[0]["id"] == second_id
+
+
+def test_append_event_group_commit(log_query, data_dir):
+    ids = [
+        log_query.append_event({"conversation_id": "gamma", "type": "AGENT_UPDATE", "payload": {"n": idx}})
+        for idx in range(50)
+    ]
+    last_id = log_query.append_event({"conversation_id": "gamma", "type": "AGENT_RESULT"}, sync=True)
+    log_path = data_dir / "logs" / "gamma.jsonl"
+    lines = log_path.read_text().splitlines()
+    assert len(lines) == 51
+    assert json.loads(lines[-1])["id"] == last_id
+    assert [json.loads(line)["id"] for line in lines[:-1]] == ids
+
+
+def test_tail_picks_up_foreign_appends(log_query, data_dir):
+    ids = [
+        log_query.append_event({"conversation_id": "delta", "type": "AGENT_UPDATE", "payload": {"n": idx}})
+        for idx in range(10)
+    ]
+    assert [event["id"] for event in log_query.tail("delta", limit=3)] == ids[-3:]
+    log_path = data_dir / "logs" / "delta.jsonl"
+    with log_path.open("a") as handle:
+        handle.write(json.dumps({"id": "evt-manual", "timestamp": "2999-01-01T00:00:00.000Z"}) + "\n")
+        handle.write('{"id": "evt-partial"')
+    assert [event["id"] for event in log_query.tail("delta", limit=50)] == ids + ["evt-manual"]
+
+    log_path.write_text(json.dumps({"id": "evt-rewritten", "timestamp": "2999-01-01T00:00:00.000Z"}) + "\n")
+    assert [event["id"] for event in log_query.tail("delta")] == ["evt-rewritten"]
+
+
+def test_since_stops_at_cutoff(log_query, data_dir):
+    log_path = data_dir / "logs" / "epsilon.jsonl"
+    stamps = ["2024-01-01T00:00:00.000000Z", "2024-01-02T00:00:00.000000Z", "2024-01-03T00:00:00.000000Z"]
+    log_path.write_text(
+        "".join(
+            json.dumps({"id": f"evt-{idx}", "conversation_id": "epsilon", "timestamp": stamp}) + "\n"
+            for idx, stamp in enumerate(stamps)
+        )
+    )
+    events = log_query.since("2024-01-02T00:00:00+00:00")
+    assert [event["id"] for event in events] == ["evt-1", "evt-2"]
+
+
+def test_by_type_merges_own_and_foreign_events(log_query, data_dir):
+    own_id = log_query.append_event({
+        "conversation_id": "zeta",
+        "type": "AGENT_RESULT",
+        "visibility": "internal",
+    })
+    log_query.append_event({"conversation_id": "zeta", "type": "AGENT_UPDATE", "visibility": "internal"})
+    assert [event["id"] for event in log_query.by_type(["AGENT_RESULT"])] == [own_id]
+    with (data_dir / "logs" / "zeta.jsonl").open("a") as handle:
+        handle.write(json.dumps({
+            "id": "evt-manual",
+            "conversation_id": "zeta",
+            "type": "AGENT_RESULT",
+            "visibility": "internal",
+            "timestamp": "2999-01-01T00:00:00.000Z",
+        }) + "\n")
+
+    results = log_query.by_type(["AGENT_RESULT"], visibility="internal")
+    assert [event["id"] for event in results] == [own_id, "evt-manual"]
+    assert log_query.by_type(["AGENT_RESULT"], visibility="user") == []
+
+
+def test_since_handles_millisecond_timestamps(log_query, data_dir):
+    log_path = data_dir / "logs" / "eta.jsonl"
+    log_path.write_text(
+        json.dumps({"id": "evt-early", "timestamp": "2024-01-01T00:00:00.123Z"}) + "\n"
+        + json.dumps({"id": "evt-late", "timestamp": "2024-01-01T00:00:00.124Z"}) + "\n"
+    )
+    events = log_query.since("2024-01-01T00:00:00.123500Z")
+    assert [event["id"] for event in events] == ["evt-late"]
+
+
+def test_writer_reuses_bounded_append_descriptors(log_query, data_dir, monkeypatch):
+    monkeypatch.setattr(log_query, "LOG_FD_CACHE_SIZE", 2)
+    for name in ("one", "two", "three"):
+        log_query.append_event({"conversation_id": name, "type": "AGENT_UPDATE"})
+    log_query.flush_pending()
+    assert [path.stem for path in log_query._log_fds] == ["two", "three"]
+
+    log_path = data_dir / "logs" / "three.jsonl"
+    log_path.unlink()
+    event_id = log_query.append_event({"conversation_id": "three", "type": "AGENT_RESULT"}, sync=True)
+    assert [json.loads(line)["id"] for line in log_path.read_text().splitlines()] == [event_id]
+
+
+def test_append_events_keeps_order_per_conversation(log_query, data_dir):
+    ids = log_query.append_events([
+        {"conversation_id": "theta", "type": "USER_MESSAGE"},
+        {"conversation_id": "iota", "type": "USER_MESSAGE"},
+        {"conversation_id": "theta", "type": "AGENT_UPDATE"},
+    ], sync=True)
+    assert len(set(ids)) == 3
+    theta = [json.loads(line)["id"] for line in (data_dir / "logs" / "theta.jsonl").read_text().splitlines()]
+    assert theta == [ids[0], ids[2]]
+    assert [event["id"] for event in log_query.tail("iota")] == [ids[1]]
+
+    with pytest.raises(ValueError):
+        log_query.append_events([{"conversation_id": "theta"}, {"type": "USER_MESSAGE"}])
+    assert len(log_query.tail("theta")) == 2
+
+
+def test_sync_append_raises_when_the_write_fails(log_query, data_dir, monkeypatch):
+    logs = data_dir / "logs"
+    logs.rmdir()
+    logs.write_text("")
+    with pytest.raises(OSError):
+        log_query.append_event({"conversation_id": "kappa", "type": "AGENT_RESULT"}, sync=True)
+    with pytest.raises(OSError):
+        log_query.append_events([{"conversation_id": "kappa", "type": "AGENT_RESULT"}], sync=True)
+
+    logs.unlink()
+    logs.mkdir()
+    commit_batch = log_query._commit_batch
+    failures = iter([RuntimeError("boom")])
+
+    def flaky_commit(batch):
+        for exc in failures:
+            raise exc
+        commit_batch(batch)
+
+    monkeypatch.setattr(log_query, "_commit_batch", flaky_commit)
+    with pytest.raises(RuntimeError):
+        log_query.append_event({"conversation_id": "kappa", "type": "AGENT_RESULT"}, sync=True)
+    event_id = log_query.append_event({"conversation_id": "kappa", "type": "AGENT_RESULT"}, sync=True)
+    assert [event["id"] for event in log_query.tail("kappa")] == [event_id]
+
+
+def test_readers_are_not_starved_by_steady_appends(log_query):
+    stop = threading.Event()
+
+    def flood():
+        while not stop.is_set():
+            log_query.append_event({"conversation_id": "lambda", "type": "AGENT_UPDATE"})
+
+    # Threads do not inherit the use_data_dir() context; hand it over.
+    writers = [threading.Thread(target=contextvars.copy_context().run, args=(flood,)) for _ in range(4)]
+    for writer in writers:
+        writer.start()
+    try:
+        time.sleep(0.05)
+        reader = threading.Thread(target=contextvars.copy_context().run, args=(log_query.tail, "lambda"))
+        reader.start()
+        reader.join(timeout=5)
+        assert not reader.is_alive()
+    finally:
+        stop.set()
+        for writer in writers:
+            writer.join()
+    log_query.flush_pending()
+
+
+def test_mirror_skips_or_tolerates_foreign_lines(log_query, data_dir):
+    first = log_query.append_event({"conversation_id": "mu", "type": "AGENT_UPDATE"}, sync=True)
+    assert [event["id"] for event in log_query.tail("mu")] == [first]
+    with (data_dir / "logs" / "mu.jsonl").open("a") as handle:
+        handle.write("[1, 2]\n")
+        handle.write("not json\n")
+        handle.write(json.dumps({"id": "evt-numeric", "type": ["odd"], "timestamp": 1700000000}) + "\n")
+        handle.write(json.dumps({"id": "evt-bad-stamp", "type": "AGENT_UPDATE", "timestamp": "yesterday"}) + "\n")
+    last = log_query.append_event({"conversation_id": "mu", "type": "AGENT_UPDATE"}, sync=True)
+
+    ids = [first, "evt-numeric", "evt-bad-stamp", last]
+    assert [event["id"] for event in log_query.tail("mu")] == ids
+    assert [event["id"] for event in log_query.tail("mu")] == ids
+    assert [event["id"] for event in log_query.by_type(["AGENT_UPDATE"])] == [first, "evt-bad-stamp", last]
+    assert [event["id"] for event in log_query.since("2000-01-01T00:00:00Z")] == ids
+
+
+def test_query_results_do_not_alias_the_mirror(log_query):
+    log_query.append_event({"conversation_id": "nu", "type": "AGENT_UPDATE", "payload": {"n": 1}}, sync=True)
+    log_query.tail("nu")[0]["payload"]["n"] = 2
+    log_query.since("2000-01-01T00:00:00Z")[0]["payload"]["n"] = 3
+    log_query.by_type(["AGENT_UPDATE"])[0]["payload"]["n"] = 4
+    assert log_query.tail("nu")[0]["payload"] == {"n": 1}
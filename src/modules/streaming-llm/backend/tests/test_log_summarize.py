@@ -1,31 +1,15 @@
 from __future__ import annotations
 
-import importlib
-import sys
-from pathlib import Path
+import json
 
 import pytest
 
-MODULE_PATH = "backend.log.summarize"
-
-
-def _prepare_module(tmp_path: Path, monkeypatch):
-    data_dir = tmp_path / "data"
-    (data_dir / "logs").mkdir(parents=True)
-    (data_dir / "summaries").mkdir()
-    (data_dir / "archive").mkdir()
-    (data_dir / "tasks.graph.json").write_text('{"tasks": []}')
-    monkeypatch.setenv("STREAMING_LLM_DATA_DIR", str(data_dir))
-    if MODULE_PATH in sys.modules:
-        sys.modules.pop(MODULE_PATH)
-    module = importlib.import_module(MODULE_PATH)
-    module = importlib.reload(module)
-    return module, data_dir
+SUMMARY_REF = "deadbeef" * 8
 
 
 @pytest.fixture
-def log_summarize(tmp_path, monkeypatch):
-    return _prepare_module(tmp_path, monkeypatch)
+def log_summarize(backend_modules, data_dir):
+    return backend_modules.log_summarize, data_dir
 
 
 def test_rolling_summary_groups_events(log_summarize):
@@ -42,12 +26,29 @@ def test_rolling_summary_groups_events(log_summarize):
     assert len(summary["summary_ref"]) == 64
 
 
+def test_rolling_summary_columnar_matches_event_form(log_summarize):
+    module, _ = log_summarize
+    types = ("USER_MESSAGE", "AGENT_UPDATE", "USER_MESSAGE", "NARRATION")
+    payloads = ({"text": "Hello"}, {"state": "working"}, "Status?", None)
+    events = [{"type": event_type, "payload": payload} for event_type, payload in zip(types, payloads)]
+    assert module.rolling_summary_columnar("alpha", types, payloads) == module.rolling_summary("alpha", events)
+    with pytest.raises(ValueError):
+        module.rolling_summary_columnar("alpha", types, payloads[:2])
+
+
+def test_flat_payload_memo_keeps_signed_zero_apart(log_summarize):
+    module, _ = log_summarize
+    for value in (0.0, -0.0, float("nan"), 1e300):
+        summary = module.rolling_summary("alpha", [{"type": "METRIC", "payload": {"delta": value}}])
+        assert summary["content"] == f"### METRIC\n- {json.dumps({'delta': value})}"
+
+
 def test_persist_summary_writes_markdown(log_summarize):
     module, data_dir = log_summarize
     summary = {
         "conversation_id": "alpha",
         "content": "### USER_MESSAGE\n- Hello",
-        "summary_ref": "deadbeef" * 8
+        "summary_ref": SUMMARY_REF
     }
     path = module.persist_summary("alpha", summary)
     assert path == data_dir / "summaries" / "alpha.md"
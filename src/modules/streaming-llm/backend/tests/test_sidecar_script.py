@@ -1,45 +1,86 @@
 from __future__ import annotations
 
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, FrozenSet, NamedTuple, Optional, Set
+
+import pytest
 
 STREAMING_ROOT = Path(__file__).resolve().parents[2]
+RUN_SIDECAR = STREAMING_ROOT / "scripts" / "run-sidecar.sh"
+COMPOSE_FILE = STREAMING_ROOT / "docker" / "workflow-runner" / "streaming-llm.compose.yml"
+README = STREAMING_ROOT / "README.md"
+ENV_TEMPLATE = STREAMING_ROOT / ".env.sidecar.example"
+
+
+class _Required(NamedTuple):
+    tokens: FrozenSet[bytes]
+    pattern: "re.Pattern[bytes]"
+
+
+def _required(*tokens: str) -> _Required:
+    """Compile ``tokens`` into one alternation matched over undecoded bytes."""
+    encoded = frozenset(token.encode() for token in tokens)
+    # The lookahead reports every match start, so overlapping tokens still count.
+    pattern = re.compile(b"(?=(" + b"|".join(map(re.escape, encoded)) + b"))")
+    return _Required(encoded, pattern)
+
+
+RUN_SIDECAR_REQUIRED = _required("uvicorn backend.server:app", "pip install -r backend/requirements.txt")
+COMPOSE_REQUIRED = _required("streaming-llm", ".env.sidecar", "8000")
+README_REQUIRED = _required(
+    "Sidecar Deployment", "run-sidecar.sh", "docker/workflow-runner/streaming-llm.compose.yml"
+)
+ENV_REQUIRED = _required(
+    "STREAMING_LLM_HOST=",
+    "STREAMING_LLM_PORT=",
+    "STREAMING_LLM_LOG_DIR=",
+    "STREAMING_LLM_SUMMARY_DIR="
+)
+
+
+def _read_optional(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+@pytest.fixture(scope="session")
+def streaming_files() -> Dict[Path, Optional[bytes]]:
+    """Raw contents of the sidecar files, read concurrently once per session (None if absent)."""
+    paths = (RUN_SIDECAR, COMPOSE_FILE, README, ENV_TEMPLATE)
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        return dict(zip(paths, pool.map(_read_optional, paths)))
+
+
+def _missing(data: bytes, required: _Required) -> Set[str]:
+    """Return the required tokens absent from ``data`` using one regex pass."""
+    return {token.decode() for token in required.tokens.difference(required.pattern.findall(data))}
+
+
+def test_run_sidecar_exists(streaming_files):
+    contents = streaming_files[RUN_SIDECAR]
+    assert contents is not None, "run-sidecar.sh must exist"
+    assert contents.startswith(b"#!/"), "script must have shebang"
+    assert not _missing(contents, RUN_SIDECAR_REQUIRED)
+
+
+def test_compose_snippet_exists(streaming_files):
+    data = streaming_files[COMPOSE_FILE]
+    assert data is not None, "docker compose snippet missing"
+    assert not _missing(data, COMPOSE_REQUIRED)
+
+
+def test_readme_mentions_sidecar_section(streaming_files):
+    data = streaming_files[README]
+    assert data is not None
+    assert not _missing(data, README_REQUIRED)
 
 
-def test_run_sidecar_exists():
-    script = STREAMING_ROOT / "scripts" / "run-sidecar.sh"
-    assert script.exists(), "run-sidecar.sh must exist"
-    contents = script.read_text()
-    assert contents.startswith("#!/"), "script must have shebang"
-    assert "uvicorn backend.server:app" in contents
-    assert "pip install -r backend/requirements.txt" in contents
-
-
-def test_compose_snippet_exists():
-    compose_file = STREAMING_ROOT / "docker" / "workflow-runner" / "streaming-llm.compose.yml"
-    assert compose_file.exists(), "docker compose snippet missing"
-    text = compose_file.read_text()
-    assert "streaming-llm" in text
-    assert ".env.sidecar" in text
-    assert "8000" in text
-
-
-def test_readme_mentions_sidecar_section():
-    readme = STREAMING_ROOT / "README.md"
-    assert readme.exists()
-    text = readme.read_text()
-    assert "Sidecar Deployment" in text
-    assert "run-sidecar.sh" in text
-    assert "docker/workflow-runner/streaming-llm.compose.yml" in text
-
-
-def test_env_template_has_extra_vars():
-    env_file = STREAMING_ROOT / ".env.sidecar.example"
-    text = env_file.read_text()
-    required = [
-        "STREAMING_LLM_HOST=",
-        "STREAMING_LLM_PORT=",
-        "STREAMING_LLM_LOG_DIR=",
-        "STREAMING_LLM_SUMMARY_DIR="
-    ]
-    for entry in required:
-        assert entry in text, f"missing {entry}"
+def test_env_template_has_extra_vars(streaming_files):
+    data = streaming_files[ENV_TEMPLATE]
+    assert data is not None, ".env.sidecar.example missing"
+    missing = _missing(data, ENV_REQUIRED)
+    assert not missing, f"missing {sorted(missing)}"
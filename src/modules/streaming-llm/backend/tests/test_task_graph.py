@@ -1,33 +1,14 @@
 from __future__ import annotations
 
-import importlib
-from pathlib import Path
-from typing import Tuple
-
+import orjson
 import pytest
 
-MODULE_PATH = "backend.task_graph.store"
-
-
-def _prepare_module(tmp_path: Path, monkeypatch):
-    data_dir = tmp_path / "data"
-    data_dir.mkdir()
-    (data_dir / "logs").mkdir()
-    (data_dir / "summaries").mkdir()
-    (data_dir / "archive").mkdir()
-    graph_file = data_dir / "tasks.graph.json"
-    graph_file.write_text('{"tasks": []}')
-    monkeypatch.setenv("STREAMING_LLM_DATA_DIR", str(data_dir))
-    if MODULE_PATH in importlib.sys.modules:
-        importlib.sys.modules.pop(MODULE_PATH)
-    module = importlib.import_module(MODULE_PATH)
-    module = importlib.reload(module)
-    return module, graph_file
+_PENDING = frozenset(("PENDING",))
 
 
 @pytest.fixture
-def task_store(tmp_path, monkeypatch):
-    return _prepare_module(tmp_path, monkeypatch)
+def task_store(backend_modules, data_dir):
+    return backend_modules.task_store, data_dir / "tasks.graph.json"
 
 
 def test_create_and_list_tasks(task_store):
@@ -43,7 +24,7 @@ def test_create_and_list_tasks(task_store):
     assert created["id"].startswith("task-")
     assert created["created_at"] == created["updated_at"]
 
-    active = store.list_active({"PENDING"})
+    active = store.list_active(_PENDING)
     assert any(task["id"] == created["id"] for task in active)
 
 
@@ -63,6 +44,23 @@ def test_update_task_refreshes_timestamp(task_store):
     assert updated["outputs"]["notes"] == "working"
 
 
+def test_list_active_follows_status_changes_in_graph_order(task_store):
+    store, _ = task_store
+    first = store.create_task({"type": "analysis", "status": "PENDING"})
+    second = store.create_task({"type": "analysis", "status": "IN_PROGRESS"})
+    third = store.create_task({"type": "analysis", "status": "PENDING"})
+
+    assert [task["id"] for task in store.list_active({"PENDING"})] == [first["id"], third["id"]]
+    assert [task["id"] for task in store.list_active({"IN_PROGRESS", "PENDING"})] == [
+        first["id"], second["id"], third["id"]
+    ]
+    store.list_active({"PENDING"})[0]["status"] = "COMPLETED"
+    store.update_task(third["id"], status="COMPLETED")
+    assert [task["id"] for task in store.list_active({"PENDING"})] == [first["id"]]
+    assert store.list_active({"FAILED"}) == []
+    assert len(store.list_active()) == 3
+
+
 def test_load_and_save_graph(task_store):
     store, graph_file = task_store
     graph = store.load_graph()
@@ -72,3 +70,115 @@ def test_load_and_save_graph(task_store):
     persisted = store.load_graph()
     assert len(persisted["tasks"]) == 1
     assert persisted["tasks"][0]["id"] == "manual"
+
+
+def test_load_graph_reuses_read_until_file_changes(task_store):
+    store, graph_file = task_store
+    created = store.create_task({"type": "analysis", "status": "PENDING"})
+
+    cached = store._graph_cache
+    graph = store.load_graph()
+    assert store._graph_cache is cached
+    assert [task["id"] for task in graph["tasks"]] == [created["id"]]
+    graph["tasks"][0]["status"] = "COMPLETED"
+    assert store.load_graph()["tasks"][0]["status"] == "PENDING"
+
+    graph_file.write_text('{"tasks": [{"id": "external", "type": "analysis", "status": "PENDING"}]}')
+    assert [task["id"] for task in store.load_graph()["tasks"]] == ["external"]
+
+
+def test_nested_edits_are_written_and_never_leak_into_the_cache(task_store):
+    store, graph_file = task_store
+    task = store.create_task({"type": "analysis", "status": "PENDING", "outputs": {"notes": "draft"}})
+
+    with store.locked_graph() as graph:
+        graph["tasks"][0]["outputs"]["notes"] = "final"
+    assert orjson.loads(graph_file.read_bytes())["tasks"][0]["outputs"]["notes"] == "final"
+
+    store.load_graph()["tasks"][0]["outputs"]["notes"] = "mutated"
+    store.list_active(_PENDING)[0]["outputs"]["notes"] = "mutated"
+    store.list_active()[0]["outputs"]["notes"] = "mutated"
+    assert store.load_graph()["tasks"][0]["outputs"]["notes"] == "final"
+    assert store.list_active(_PENDING)[0]["outputs"] == {"notes": "final"}
+    assert store.claim_task(task["id"], "planner")["outputs"] == {"notes": "final"}
+
+
+def test_locked_graph_writes_only_changed_graphs(task_store):
+    store, graph_file = task_store
+    task = store.create_task({"type": "analysis", "status": "COMPLETED"})
+    before = graph_file.stat().st_mtime_ns
+
+    assert store.claim_task(task["id"], "planner") is None
+    with pytest.raises(KeyError):
+        with store.locked_graph() as graph:
+            graph["tasks"].clear()
+            raise KeyError("abort")
+    assert graph_file.stat().st_mtime_ns == before
+    assert [node["id"] for node in store.load_graph()["tasks"]] == [task["id"]]
+
+
+def test_graph_handle_survives_mutations_and_file_replacement(task_store, tmp_path):
+    store, graph_file = task_store
+    store.create_task({"type": "analysis", "status": "PENDING"})
+    handle = store._graph_file
+    store.create_task({"type": "analysis", "status": "PENDING"})
+    assert store._graph_file is handle
+
+    replacement = tmp_path / "replacement.json"
+    replacement.write_text('{"tasks": [{"id": "swapped", "type": "analysis", "status": "PENDING"}]}')
+    replacement.replace(graph_file)
+    assert [task["id"] for task in store.load_graph()["tasks"]] == ["swapped"]
+    assert handle.closed
+
+
+def test_nested_task_calls_share_one_write(task_store, monkeypatch):
+    store, _ = task_store
+    writes = []
+    write_graph = store._write_graph
+    monkeypatch.setattr(store, "_write_graph", lambda *args: writes.append(args) or write_graph(*args))
+
+    with store.locked_graph() as graph:
+        task = store.create_task({"type": "analysis", "status": "PENDING"})
+        store.update_task(task["id"], status="COMPLETED")
+        assert [node["status"] for node in graph["tasks"]] == ["COMPLETED"]
+    assert len(writes) == 1
+    assert [node["status"] for node in store.load_graph()["tasks"]] == ["COMPLETED"]
+
+
+def test_graph_writes_rewrite_only_the_changed_tail(task_store, monkeypatch):
+    store, graph_file = task_store
+    first = store.create_task({"type": "analysis", "status": "PENDING"})
+    last = store.create_task({"type": "analysis", "status": "PENDING"})
+    offsets = []
+    pwrite = store.os.pwrite
+
+    def recording_pwrite(fd, data, offset):
+        offsets.append(offset)
+        return pwrite(fd, data, offset)
+
+    monkeypatch.setattr(store.os, "pwrite", recording_pwrite)
+    # locked_graph() already holds the bytes it read, so writes skip re-reading them.
+    monkeypatch.setattr(store.os, "pread", None)
+
+    store.update_task(last["id"], status="COMPLETED")
+    text = graph_file.read_text()
+    assert offsets and min(offsets) > text.index(last["id"])
+    assert [task["status"] for task in orjson.loads(text)["tasks"]] == ["PENDING", "COMPLETED"]
+
+    store.update_task(first["id"], outputs={"notes": "working"})
+    assert min(offsets[1:]) < text.index(last["id"])
+    assert graph_file.read_bytes() == store._graph_dumps(store.load_graph())
+
+
+def test_ready_ids_are_pruned_and_bounded(task_store, monkeypatch):
+    store, _ = task_store
+    completed = store.create_task({"type": "analysis", "status": "PENDING"})
+    store.update_task(completed["id"], status="COMPLETED")
+    scanned = store.create_task({"type": "analysis", "status": "PENDING"})
+    assert store.claim_task(scanned["id"], "planner")["status"] == "IN_PROGRESS"
+    assert store.next_ready("analysis") is None
+
+    monkeypatch.setattr(store, "READY_QUEUE_SIZE", 2)
+    ids = [store.create_task({"type": "review", "status": "PENDING"})["id"] for _ in range(3)]
+    assert [store.next_ready("review") for _ in range(3)] == [ids[1], ids[2], None]
+    assert store.next_ready("unpolled") is None
@@ -29,4 +29,5 @@ PORT="${STREAMING_LLM_PORT:-8000}"
 
 cd "${MODULE_ROOT}"
 
-exec python3 -m uvicorn backend.server:app --host "${HOST}" --port "${PORT}" --workers "${STREAMING_LLM_WORKERS:-1}"
+exec python3 -m uvicorn backend.server:app --host "${HOST}" --port "${PORT}" --workers "${STREAMING_LLM_WORKERS:-1}" \
+  --loop uvloop --http httptools --ws websockets --no-access-log
@@ -52,6 +52,8 @@ export async function streamChat({
   socketFactory
 }: StreamChatParams): Promise<StreamChatHandle> {
   const socket = socketFactory ? socketFactory(backendUrl) : defaultSocketFactory(backendUrl)
+  // The backend sends each event as a binary frame of UTF-8 JSON.
+  socket.binaryType = 'arraybuffer'
   let isClosed = false
   const pendingPayloads: string[] = []
   let isSettled = false
@@ -229,10 +231,15 @@ function defaultSocketFactory(url: string): WebSocket {
   return new WebSocket(url)
 }
 
+const utf8Decoder = new TextDecoder()
+
 function parseJson(value: unknown): any {
   if (typeof value === 'string') {
     return JSON.parse(value)
   }
+  if (value instanceof ArrayBuffer || ArrayBuffer.isView(value)) {
+    return JSON.parse(utf8Decoder.decode(value))
+  }
   return value
 }
 
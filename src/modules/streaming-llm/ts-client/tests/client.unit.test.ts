@@ -58,6 +58,25 @@ describe('streaming-llm TypeScript client – unit specs', () => {
     ])
   })
 
+  it('decodes events sent as binary frames', async () => {
+    const socket = new MockWebSocket(WS_URL)
+    const events: ChatEvent[] = []
+    const handlePromise = streamChat({
+      backendUrl: WS_URL,
+      agentId: 'planner',
+      onEvent: (event) => events.push(event),
+      socketFactory: () => socket.asWebSocket()
+    })
+
+    socket.triggerOpen()
+    await handlePromise
+    expect(socket.binaryType).toBe('arraybuffer')
+
+    socket.triggerBinaryMessage({ type: 'token', token: 'h\u00e9', conversation_id: 'abc' })
+
+    expect(events).toEqual([{ type: 'token', token: 'h\u00e9', conversationId: 'abc' }])
+  })
+
   it('propagates HTTP errors from REST helpers', async () => {
     const fetchMock = vi.fn().mockResolvedValue({
       ok: false,
@@ -78,6 +97,7 @@ class MockWebSocket {
   static CLOSED = 3
 
   public readyState = MockWebSocket.CONNECTING
+  public binaryType = 'blob'
   public sentPayloads: string[] = []
   public onopen: (() => void) | null = null
   public onmessage: ((event: MessageEvent) => void) | null = null
@@ -108,6 +128,11 @@ class MockWebSocket {
     this.onmessage?.({ data: JSON.stringify(data) } as MessageEvent)
   }
 
+  triggerBinaryMessage(data: object) {
+    const bytes = new TextEncoder().encode(JSON.stringify(data))
+    this.onmessage?.({ data: bytes.buffer } as MessageEvent)
+  }
+
   triggerError(message = 'error') {
     this.onerror?.({ type: message } as Event)
   }